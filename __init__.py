@@ -1,4 +1,5 @@
 # modulo_diseno/__init__.py
+from . import utils
 from . import models
 from . import wizards
 from . import controllers
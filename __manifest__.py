@@ -1,6 +1,6 @@
 {
     "name": "Módulo de Diseños",
-    "version": "1.1",  # Updated for checklist stage loading fix
+    "version": "1.2",  # Migración de adjuntos a design.image.blob (migrations/1.2)
     "category": "Project",
     "summary": "Gestión de diseños con listas de verificación por etapas y validación",
     "author": "Nahuel Dumo",
@@ -22,6 +22,8 @@
 
         # Datos iniciales
         "data/email_templates.xml",
+        "data/ir_cron.xml",
+        "data/design_state_transition_data.xml",
 
         # Vistas principales
         "views/menu.xml",
@@ -33,10 +35,14 @@
         # Vistas de wizards
         "wizards/delete_confirm_wizard_views.xml",
         "views/revision_log_views.xml",
+        "views/revision_log_archive_views.xml",
+        "views/design_image_version_views.xml",
+        "views/design_cycle_stats_views.xml",
         
         # Vistas de wizards
         "wizards/rechazo_wizard_views.xml",
         "wizards/subir_diseno_wizard_views.xml",
+        "wizards/transicion_masiva_wizard_views.xml",
         
         # Vistas del portal
         "views/portal_templates.xml"
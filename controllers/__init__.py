@@ -1,2 +1,4 @@
 # -*- coding: utf-8 -*-
 from . import portal
+from . import metrics
+from . import upload
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from odoo import http
+from odoo.http import request
+from odoo.tools import consteq
+
+from ..utils import metrics
+
+
+class DesignMetrics(http.Controller):
+
+    def _metrics_access_allowed(self, token=None):
+        """Acceso con el token configurado (ModuloDisenoOdoo.metrics_token) o como administrador"""
+        expected = request.env['ir.config_parameter'].sudo().get_param('ModuloDisenoOdoo.metrics_token')
+        if not token:
+            authorization = request.httprequest.headers.get('Authorization', '')
+            if authorization.startswith('Bearer '):
+                token = authorization[len('Bearer '):]
+        if expected and token and consteq(expected, token):
+            return True
+        return not request.env.user._is_public() and request.env.user._get_design_roles().admin
+
+    @http.route('/design/metrics', type='http', auth='public', methods=['GET'], sitemap=False)
+    def design_metrics(self, token=None, **kw):
+        if not self._metrics_access_allowed(token):
+            return request.make_response('Forbidden', status=403, headers=[('Content-Type', 'text/plain')])
+        return request.make_response(metrics.exportar(request.db), headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Cache-Control', 'no-store'),
+        ])
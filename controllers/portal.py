@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 # UwU
+import hashlib
 import logging
-import base64
+from datetime import timezone
+from werkzeug.urls import url_encode
 from odoo import http, fields, _
+from odoo.tools import consteq, str2bool
+from ..utils import metrics
+from ..utils.profiling import perfilar
 
 _logger = logging.getLogger(__name__)
 
@@ -11,6 +16,20 @@ from odoo.addons.portal.controllers.portal import CustomerPortal, pager as porta
 from odoo.exceptions import AccessError, MissingError
 
 class DesignPortal(CustomerPortal):
+
+    # Variantes servidas por /my/design/attachment/<id>/<variant> y su campo en design.image
+    _design_image_variants = {
+        'content': 'file_data',
+        'preview': 'image_preview',
+        '128': 'image_128',
+        '512': 'image_512',
+        '1024': 'image_1024',
+    }
+    # Variantes que se sirven en WebP (campo <campo>_webp del blob) según el Accept
+    _design_webp_variants = ('512', '1024')
+
+    # Mensajes del chatter por página en el detalle del diseño
+    _messages_per_page = 20
     
     @http.route(['/my', '/my/home'], type='http', auth="user", website=True)
     def home(self, **kw):
@@ -20,7 +39,7 @@ class DesignPortal(CustomerPortal):
         partner = user.partner_id
         
         if partner.is_design_user:
-            _logger.info(f"[PORTAL] Usuario {user.name} es Usuario Diseño, redirigiendo a /my/designs")
+            _logger.debug(f"[PORTAL] Usuario {user.name} es Usuario Diseño, redirigiendo a /my/designs")
             return request.redirect('/my/designs')
         
         # Si no es usuario de diseño, comportamiento normal
@@ -31,111 +50,216 @@ class DesignPortal(CustomerPortal):
         if 'design_count' in counters:
             domain = self._get_designs_domain()
             values['design_count'] = request.env['design.design'].search_count(domain)
-            _logger.info(f"[PORTAL] Design count calculado: {values['design_count']}")
+            if self._designs_diagnostics_enabled():
+                _logger.debug(f"[PORTAL] Design count calculado: {values['design_count']}")
         return values
     
     def _get_designs_domain(self):
         """Dominio base para buscar diseños visibles para el usuario actual.
-        Coincide con la regla de seguridad design_design_rule_cliente."""
-        _logger.info("-" * 50)
-        _logger.info("[PORTAL] INICIO DE _get_designs_domain")
-        
-        # Obtener información del usuario y partner
+        Coincide con la regla de seguridad design_design_rule_cliente.
+
+        No ejecuta búsquedas: se llama varias veces por página (contador del
+        home, layout del portal y listado). El volcado de diagnóstico está en
+        _log_designs_diagnostics."""
+        partner = request.env.user.partner_id
+        return [
+            '|',
+                ('cliente_id', '=', partner.id),
+                ('cliente_id', 'child_of', partner.commercial_partner_id.id),
+            ('visible_para_cliente', '=', True),
+            ('state', 'in', ['cliente', 'correcciones_solicitadas', 'aprobado', 'rechazado'])
+        ]
+
+    def _designs_diagnostics_enabled(self):
+        """Indica si se debe volcar el diagnóstico de diseños del portal en el log.
+
+        Se activa con el parámetro del sistema ModuloDisenoOdoo.portal_diagnostics
+        o, para usuarios internos, con el modo debug (?debug=1)."""
+        if request.session.debug and request.env.user.has_group('base.group_user'):
+            return True
+        return str2bool(request.env['ir.config_parameter'].sudo().get_param(
+            'ModuloDisenoOdoo.portal_diagnostics', 'False'), default=False)
+
+    def _log_designs_diagnostics(self, domain):
+        """Vuelca en el log los diseños del usuario actual (solo en modo diagnóstico)."""
         user = request.env.user
         partner = user.partner_id
         commercial_partner = partner.commercial_partner_id
-        
+        Design = request.env['design.design']
+
+        _logger.info("-" * 50)
+        _logger.info("[PORTAL] DIAGNÓSTICO DE DISEÑOS")
         _logger.info(f"[PORTAL] Usuario: {user.name} (ID: {user.id})")
         _logger.info(f"[PORTAL] Partner: {partner.name} (ID: {partner.id})")
         _logger.info(f"[PORTAL] Partner Comercial: {commercial_partner.name} (ID: {commercial_partner.id})")
         _logger.info(f"[PORTAL] Grupos del usuario: {[g.name for g in user.groups_id]}")
-        
+
         # Verificar si el partner tiene algún diseño asociado directamente
-        designs_direct = request.env['design.design'].search([('cliente_id', '=', partner.id)])
+        designs_direct = Design.search([('cliente_id', '=', partner.id)])
         _logger.info(f"[PORTAL] Diseños asociados directamente al partner: {len(designs_direct)}")
         for idx, design in enumerate(designs_direct, 1):
             _logger.info(f"  {idx}. ID: {design.id}, Nombre: {design.name}, Estado: {design.state}, Cliente: {design.cliente_id.display_name}")
-        
+
         # Verificar diseños en la jerarquía del partner comercial
-        designs_hierarchy = request.env['design.design'].search([('cliente_id', 'child_of', partner.commercial_partner_id.id)])
+        designs_hierarchy = Design.search([('cliente_id', 'child_of', commercial_partner.id)])
         _logger.info(f"[PORTAL] Diseños en la jerarquía del partner comercial: {len(designs_hierarchy)}")
         for idx, design in enumerate(designs_hierarchy, 1):
             _logger.info(f"  {idx}. ID: {design.id}, Nombre: {design.name}, Estado: {design.state}, Cliente: {design.cliente_id.display_name}")
-        
-        # Dominio final con todos los filtros
-        _logger.info(f"Partner comercial para el dominio del portal: {partner.commercial_partner_id.name} (ID: {partner.commercial_partner_id.id})")
-        domain = [
-            '|',
-                ('cliente_id', '=', partner.id),
-                ('cliente_id', 'child_of', partner.commercial_partner_id.id),
-            ('visible_para_cliente', '=', True),
-            ('state', 'in', ['cliente', 'correcciones_solicitadas', 'aprobado', 'rechazado'])
 
-        ]
-        
-        _logger.info(f"[PORTAL] Dominio de búsqueda: {domain}")
-        
         # Verificar cuántos diseños coinciden con el dominio completo
-        matching_designs = request.env['design.design'].search(domain)
+        _logger.info(f"[PORTAL] Dominio de búsqueda: {domain}")
+        matching_designs = Design.search(domain)
         _logger.info(f"[PORTAL] Diseños que coinciden con el dominio: {len(matching_designs)}")
         for idx, design in enumerate(matching_designs, 1):
             _logger.info(f"  {idx}. ID: {design.id}, Nombre: {design.name}, Estado: {design.state}, Cliente: {design.cliente_id.display_name}, Visible: {design.visible_para_cliente}")
-        
-        return domain
-    
+
+    def _get_designs_searchbar_sortings(self):
+        # 'relevance' solo aplica con una búsqueda de texto completo (ver portal_my_designs)
+        return {
+            'relevance': {'label': _('Relevancia'), 'order': False},
+            'date': {'label': _('Más recientes'), 'order': 'create_date desc, id desc'},
+            'name': {'label': _('Nombre'), 'order': 'name asc, id desc'},
+            'state': {'label': _('Estado'), 'order': 'state asc, create_date desc, id desc'},
+        }
+
+    def _get_designs_searchbar_inputs(self):
+        return {
+            'all': {'input': 'all', 'label': _('Buscar en todo')},
+            'name': {'input': 'name', 'label': _('Buscar por nombre')},
+            'cliente': {'input': 'cliente', 'label': _('Buscar por cliente')},
+        }
+
+    def _get_designs_search_domain(self, search_in, search):
+        """Dominio de la búsqueda por texto del listado de diseños."""
+        if not search:
+            return []
+        if search_in == 'name':
+            return [('name', 'ilike', search)]
+        if search_in == 'cliente':
+            return [('cliente_id.name', 'ilike', search)]
+        # Texto completo: nombre, cliente, comentarios, checklist y chatter (índice GIN)
+        return [('texto_busqueda', '=', search)]
+
     @http.route(['/my/designs', '/my/designs/page/<int:page>'], type='http', auth="user", website=True, sitemap=False)
-    def portal_my_designs(self, page=1, date_begin=None, date_end=None, sortby=None, filterby=None, search=None, search_in='all', **kw):
-        """Muestra la lista de diseños del usuario en el portal."""
-        _logger.info("=" * 50)
-        _logger.info("[PORTAL] INICIO DE PORTAL_MY_DESIGNS")
-        _logger.info(f"[PORTAL] Usuario actual: {request.env.user.name} (ID: {request.env.user.id})")
-        _logger.info(f"[PORTAL] Parámetros de URL: page={page}, date_begin={date_begin}, date_end={date_end}")
-        _logger.info("=" * 50)
-        
+    @metrics.cronometrar('design_portal_request_seconds', route='portal_my_designs')
+    @perfilar('portal.portal_my_designs')
+    def portal_my_designs(self, page=1, date_begin=None, date_end=None, sortby=None, filterby=None, search=None, search_in='all', etapa=None, **kw):
+        """Muestra la lista de diseños del usuario en el portal.
+
+        Los contadores por estado salen de un único read_group y las filas de la
+        página de un único search_read con los campos que usa la plantilla."""
+        Design = request.env['design.design']
+
         # Obtener el dominio base
         domain = self._get_designs_domain()
-        
+        diagnostics = self._designs_diagnostics_enabled()
+        if diagnostics:
+            self._log_designs_diagnostics(domain)
+
+        # Filtros comunes a los contadores y al listado (todo menos el estado)
+        if etapa in dict(Design._fields['etapa'].selection):
+            domain += [('etapa', '=', etapa)]
+        else:
+            etapa = None
+        if date_begin and date_end:
+            domain += [('create_date', '>', date_begin), ('create_date', '<=', date_end)]
+        searchbar_inputs = self._get_designs_searchbar_inputs()
+        if search_in not in searchbar_inputs:
+            search_in = 'all'
+        domain += self._get_designs_search_domain(search_in, search)
+
+        # Contadores por estado en una sola consulta agrupada
+        state_labels = dict(Design._fields['state'].selection)
+        state_counts = {
+            group['state']: group['state_count']
+            for group in Design.read_group(domain, ['state'], ['state'])
+        }
+        searchbar_filters = {
+            'all': {'label': _('Todos (%s)', sum(state_counts.values())), 'domain': []},
+        }
+        for state in ('cliente', 'correcciones_solicitadas', 'aprobado', 'rechazado'):
+            searchbar_filters[state] = {
+                'label': f"{state_labels[state]} ({state_counts.get(state, 0)})",
+                'domain': [('state', '=', state)],
+            }
+        if filterby not in searchbar_filters:
+            filterby = 'all'
+        domain += searchbar_filters[filterby]['domain']
+        if filterby == 'all':
+            design_count = sum(state_counts.values())
+        else:
+            design_count = state_counts.get(filterby, 0)
+
+        searchbar_sortings = self._get_designs_searchbar_sortings()
+        ranked = bool(search) and search_in == 'all'
+        if not ranked:
+            searchbar_sortings.pop('relevance')
+        if sortby not in searchbar_sortings:
+            sortby = 'relevance' if ranked else 'date'
+
         # Configurar la paginación
-        design_count = request.env['design.design'].search_count(domain)
         pager = portal_pager(
             url="/my/designs",
+            url_args={'date_begin': date_begin, 'date_end': date_end, 'sortby': sortby, 'filterby': filterby,
+                      'search_in': search_in, 'search': search, 'etapa': etapa},
             total=design_count,
             page=page,
             step=self._items_per_page
         )
-        
-        # Obtener los diseños paginados
-        designs = request.env['design.design'].search(
-            domain,
-            limit=self._items_per_page,
-            offset=pager['offset'],
-            order='create_date desc'  # Ordenar por fecha de creación descendente
-        )
-        
-        _logger.info(f"Dominio final usado en la búsqueda: {domain}")
-        _logger.info(f"Diseños encontrados para el portal: {[d.name for d in designs]} (Total: {len(designs)})")
-        
+
+        # Obtener solo los campos que muestra la plantilla de la página actual
+        if sortby == 'relevance':
+            # Orden por ts_rank en SQL; la página se lee luego respetando ese orden
+            design_ids = Design._buscar_por_relevancia(
+                domain, search, limit=self._items_per_page, offset=pager['offset'])
+            designs = Design.browse(design_ids).read(['name', 'create_date', 'state', 'etapa'])
+        else:
+            designs = Design.search_read(
+                domain,
+                ['name', 'create_date', 'state', 'etapa'],
+                limit=self._items_per_page,
+                offset=pager['offset'],
+                order=searchbar_sortings[sortby]['order'],
+            )
+
+        if diagnostics:
+            _logger.info(f"Dominio final usado en la búsqueda: {domain}")
+            _logger.info(f"Diseños encontrados para el portal: {[d['name'] for d in designs]} (Total: {design_count})")
+
         # Preparar valores para la plantilla
         values = self._prepare_portal_layout_values()
         values.update({
             'designs': designs,
+            'state_labels': state_labels,
+            'etapa_labels': dict(Design._fields['etapa'].selection),
             'page_name': 'design',
             'default_url': '/my/designs',
             'pager': pager,
             'design_count': design_count,
+            'date_begin': date_begin,
+            'date_end': date_end,
+            'searchbar_sortings': searchbar_sortings,
+            'sortby': sortby,
+            'searchbar_filters': searchbar_filters,
+            'filterby': filterby,
+            'searchbar_inputs': searchbar_inputs,
+            'search_in': search_in,
+            'search': search,
+            'etapa': etapa,
         })
-        
-        _logger.info(f"Buscando diseños para el partner {request.env.user.partner_id.id} con el dominio: {domain}")
-        _logger.info(f"Se encontraron {design_count} diseños.")
-        
-        _logger.warning(f"[PORTAL] Mostrando {len(designs)} diseños de un total de {design_count}")
         return request.render("ModuloDisenoOdoo.portal_my_designs", values)
     
     @http.route(['/my/design/<int:design_id>'], type='http', auth="user", website=True, sitemap=False)
-    def portal_my_design(self, design_id, access_token=None, **kw):
+    @metrics.cronometrar('design_portal_request_seconds', route='portal_my_design')
+    @perfilar('portal.portal_my_design')
+    def portal_my_design(self, design_id, access_token=None, messages_before=None, **kw):
         """Muestra los detalles de un diseño específico en el portal."""
         try:
-                     
+            messages_before = int(messages_before) if messages_before else None
+        except ValueError:
+            messages_before = None
+
+        try:
             if request.env.user.has_group('base.group_user'):
                 design_sudo = request.env['design.design'].sudo().browse(design_id)
                 if not design_sudo.exists():
@@ -145,51 +269,42 @@ class DesignPortal(CustomerPortal):
         except (AccessError, MissingError):
             return request.redirect('/my')
 
-        # Generar tokens de acceso para los adjuntos si no existen
+        # Validadores de caché: si el cliente ya tiene esta versión de la página, responder 304
+        etag, last_modified = self._get_design_page_validators(design_sudo, {
+            'access_token': access_token,
+            'messages_before': messages_before,
+            'message': kw.get('message'),
+            'error': kw.get('error'),
+        })
+        if self._is_not_modified(etag, last_modified):
+            response = request.make_response('', status=304)
+            self._set_cache_validators(response, etag, last_modified)
+            return response
+
+        # Construir los datos de los adjuntos con URLs de descarga (el contenido se sirve por streaming)
+        attachments = []
         for attachment in design_sudo.attachment_ids:
+            # Generar tokens de acceso para los adjuntos si no existen
             if not attachment.access_token:
                 attachment.sudo()._portal_ensure_token()
-                
-        # Construir datos de archivos usando base64 directamente (sin URLs externas)
-        attachments = []
-        for attachment in design_sudo.attachment_ids:
-            # Obtener los datos del archivo en base64 (usando file_data del modelo design.image)
-            file_data = attachment.file_data
-            if file_data:
-                # Crear data URL para descarga
-                data_url = f"data:{attachment.mimetype or 'application/octet-stream'};base64,{file_data.decode('utf-8')}"
-                
-                # Usar image_preview para la previsualización si está disponible
-                preview_url = None
-                if attachment.image_preview:
-                    preview_url = f"data:{attachment.mimetype or 'image/jpeg'};base64,{attachment.image_preview.decode('utf-8')}"
-                
-                attachments.append({
-                    'id': attachment.id,
-                    'name': attachment.name,
-                    'mimetype': attachment.mimetype,
-                    'file_size': attachment.file_size,
-                    'data_url': data_url,
-                    'preview_url': preview_url or data_url,  # Usar preview si existe, sino usar data_url
-                    'file_extension': attachment.name.split('.')[-1].lower() if '.' in attachment.name else ''
-                })
-
-        # Obtener mensajes del chatter - incluir todos los tipos para debug
-        messages = []
-        for message in design_sudo.message_ids.sorted('create_date', reverse=False):
-            # Mostrar todos los comentarios legibles por el portal (según reglas de seguridad)
-            if (
-                message.message_type == 'comment'
-                and message.body
-            ):
-                messages.append({
-                    'id': message.id,
-                    'body': message.body,
-                    'author_name': (message.sudo().author_id.name) or 'Sistema',
-                    'date': message.create_date.strftime('%d/%m/%Y %H:%M'),
-                    'message_type': message.message_type,
-                    'is_internal': message.is_internal,
-                })
+
+            content_url = self._design_attachment_url(attachment)
+            is_image = bool(attachment.mimetype and attachment.mimetype.startswith('image/'))
+            attachments.append({
+                'id': attachment.id,
+                'name': attachment.name,
+                'mimetype': attachment.mimetype,
+                'file_size': attachment.file_size,
+                'url': content_url,
+                'download_url': self._design_attachment_url(attachment, download=True),
+                # Las miniaturas solo existen para imágenes (ver design.image._compute_image_variants)
+                'preview_url': self._design_attachment_url(attachment, variant='512') if is_image else content_url,
+                'zoom_url': self._design_attachment_url(attachment, variant='1024') if is_image else content_url,
+                'file_extension': attachment.name.split('.')[-1].lower() if '.' in attachment.name else ''
+            })
+
+        # Obtener la página de mensajes del chatter (la más reciente, o la anterior a messages_before)
+        messages, older_messages_cursor = self._get_design_messages(design_sudo, before=messages_before)
 
         # Valores seguros para portal: nombres de tarea y diseñador sin acceder al modelo desde QWeb
         task_display_name = ''
@@ -212,7 +327,7 @@ class DesignPortal(CustomerPortal):
             cliente_display_name = ''
         
         # Agregar mensaje de prueba si no hay mensajes
-        if not messages:
+        if not messages and not messages_before:
             messages.append({
                 'id': 0,
                 'body': '<p>¡Bienvenido al sistema de mensajería! Aquí aparecerán todos los mensajes entre el cliente y el equipo de diseño.</p>',
@@ -232,19 +347,208 @@ class DesignPortal(CustomerPortal):
             'access_token': design_sudo.access_token,
             'attachments': attachments,
             'messages': messages,
+            'older_messages_cursor': older_messages_cursor,
             'task_display_name': task_display_name,
             'designer_display_name': designer_display_name,
             'cliente_display_name': cliente_display_name,
         })
-        return request.render("ModuloDisenoOdoo.portal_my_design", values)
+        response = request.render("ModuloDisenoOdoo.portal_my_design", values)
+        self._set_cache_validators(response, etag, last_modified)
+        return response
+
+    def _get_design_page_validators(self, design, params):
+        """Calcula el ETag y la fecha de última modificación del detalle de un diseño.
+
+        Dependen del diseño (write_date), del contenido de sus adjuntos (checksum) y
+        del último mensaje del chatter. El ETag incluye además el usuario, la sesión
+        (la página lleva su token CSRF), el idioma y los parámetros de la URL."""
+        design_sudo = design.sudo()
+        attachments = design_sudo.attachment_ids.read(['checksum', 'write_date'])
+        last_message = request.env['mail.message'].sudo().search_read(
+            [('model', '=', 'design.design'), ('res_id', '=', design.id)],
+            ['write_date'], limit=1, order='id desc',
+        )
+
+        signature = (
+            design.id,
+            str(design_sudo.write_date),
+            tuple((attachment['id'], attachment['checksum']) for attachment in attachments),
+            last_message[0]['id'] if last_message else None,
+            request.env.uid,
+            hashlib.sha1((request.session.sid or '').encode()).hexdigest(),
+            request.env.lang,
+            tuple(sorted((key, str(value)) for key, value in params.items() if value)),
+        )
+        etag = hashlib.sha1(repr(signature).encode()).hexdigest()
+
+        dates = [design_sudo.write_date] + [attachment['write_date'] for attachment in attachments]
+        if last_message:
+            dates.append(last_message[0]['write_date'])
+        last_modified = max(filter(None, dates), default=None)
+        return etag, last_modified
+
+    def _is_not_modified(self, etag, last_modified):
+        """Evalúa If-None-Match (prioritario) e If-Modified-Since de la petición."""
+        httprequest = request.httprequest
+        if httprequest.if_none_match:
+            return httprequest.if_none_match.contains_weak(etag)
+        if_modified_since = httprequest.if_modified_since
+        if if_modified_since and last_modified:
+            if if_modified_since.tzinfo:
+                if_modified_since = if_modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+            return last_modified.replace(microsecond=0) <= if_modified_since
+        return False
+
+    def _set_cache_validators(self, response, etag, last_modified):
+        """Agrega ETag y Last-Modified, obligando al navegador a revalidar la página."""
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
     
+    def _design_attachment_url(self, attachment, variant=None, download=False):
+        """URL del contenido de un adjunto de diseño, firmada con su token de acceso."""
+        url = f'/my/design/attachment/{attachment.id}'
+        if variant:
+            url += f'/{variant}'
+        params = {'access_token': attachment.access_token}
+        if attachment.checksum:
+            # El checksum en la URL la hace inmutable: cambia cuando cambia el contenido
+            params['unique'] = attachment.checksum
+        if download:
+            params['download'] = 1
+        return f'{url}?{url_encode(params)}'
+
+    def _acepta_webp(self):
+        """Indica si el Accept de la petición incluye image/webp con calidad mayor que 0"""
+        return any(mimetype == 'image/webp' and quality
+                   for mimetype, quality in request.httprequest.accept_mimetypes)
+
+    def _design_image_check_access(self, attachment_id, access_token=None):
+        """Verificar el acceso a un adjunto de diseño (design.image) y devolverlo en sudo.
+
+        Se acepta el token de acceso del adjunto o, en su defecto, el acceso del
+        usuario al diseño al que pertenece."""
+        attachment_sudo = request.env['design.image'].sudo().browse(attachment_id).exists()
+        if not attachment_sudo:
+            raise MissingError(_("El adjunto no existe o fue eliminado"))
+
+        # Usuarios internos: mismo criterio que en portal_my_design
+        if request.env.user.has_group('base.group_user'):
+            return attachment_sudo
+
+        if access_token and attachment_sudo.access_token and consteq(attachment_sudo.access_token, access_token):
+            return attachment_sudo
+
+        if not request.env.user._is_public():
+            self._document_check_access('design.design', attachment_sudo.design_id.id)
+            return attachment_sudo
+
+        raise AccessError(_("No tiene permiso para acceder a este adjunto"))
+
+    @http.route(['/my/design/attachment/<int:attachment_id>',
+                 '/my/design/attachment/<int:attachment_id>/<string:variant>'],
+                type='http', auth="public", website=True, sitemap=False)
+    @metrics.cronometrar('design_portal_request_seconds', route='portal_design_attachment')
+    @perfilar('portal.portal_design_attachment')
+    def portal_design_attachment(self, attachment_id, variant='content', access_token=None, download=None, unique=None, **kw):
+        """Sirve el contenido de un adjunto de diseño por streaming desde el filestore.
+
+        La respuesta admite peticiones parciales (HTTP Range), por lo que el archivo
+        nunca se carga completo en memoria ni se codifica en base64. También responde
+        304 a If-None-Match / If-Modified-Since; si la URL lleva el checksum vigente
+        (``unique``) se sirve como inmutable con caché de larga duración."""
+        field_name = self._design_image_variants.get(variant)
+        if not field_name:
+            raise request.not_found()
+
+        try:
+            attachment_sudo = self._design_image_check_access(attachment_id, access_token=access_token)
+        except (AccessError, MissingError):
+            raise request.not_found()
+
+        if not attachment_sudo.blob_id:
+            raise request.not_found()
+
+        # Miniaturas en WebP solo si el navegador lista image/webp de forma explícita
+        # (los comodines */* e image/* también los envían clientes sin soporte)
+        if variant in self._design_webp_variants and attachment_sudo.blob_id.webp \
+                and self._acepta_webp():
+            field_name = f'{field_name}_webp'
+
+        # El contenido y sus miniaturas viven en el blob deduplicado
+        stream = request.env['ir.binary']._get_stream_from(
+            attachment_sudo.blob_id, field_name,
+            filename=attachment_sudo.name,
+            default_mimetype=attachment_sudo.mimetype or 'application/octet-stream',
+        )
+        immutable = bool(unique) and unique == attachment_sudo.checksum
+        response = stream.get_response(as_attachment=bool(download), immutable=immutable)
+        if variant in self._design_webp_variants:
+            response.vary.add('Accept')
+        if response.status_code in (200, 206):
+            metrics.incrementar(request.env, 'design_attachment_bytes_served_total',
+                                response.content_length or 0, variant=variant)
+        return response
+
+    def _get_design_messages(self, design, before=None):
+        """Devuelve una página de comentarios del chatter del diseño.
+
+        El filtrado (comentarios con cuerpo) y el orden se resuelven en SQL, y los
+        autores se leen en un solo lote. La paginación es por cursor: ``before`` es
+        el id del mensaje más antiguo ya mostrado, así el coste de cada página no
+        depende del tamaño del historial.
+
+        :return: (lista de mensajes en orden cronológico, cursor para la página
+                  anterior o None si no hay mensajes más antiguos)
+        """
+        domain = [
+            ('model', '=', 'design.design'),
+            ('res_id', '=', design.id),
+            ('message_type', '=', 'comment'),
+            ('body', '!=', False),
+            ('body', '!=', ''),
+        ]
+        if before:
+            domain.append(('id', '<', before))
+
+        # Se pide un registro extra para saber si quedan mensajes más antiguos
+        rows = design.env['mail.message'].search_read(
+            domain,
+            ['body', 'author_id', 'create_date', 'message_type', 'is_internal'],
+            limit=self._messages_per_page + 1,
+            order='id desc',
+            load=None,
+        )
+        has_older = len(rows) > self._messages_per_page
+        rows = rows[:self._messages_per_page]
+
+        author_ids = {row['author_id'] for row in rows if row['author_id']}
+        author_names = {
+            partner['id']: partner['name']
+            for partner in request.env['res.partner'].sudo().browse(author_ids).read(['name'])
+        }
+
+        messages = [{
+            'id': row['id'],
+            'body': row['body'],
+            'author_name': author_names.get(row['author_id']) or 'Sistema',
+            'date': row['create_date'].strftime('%d/%m/%Y %H:%M'),
+            'message_type': row['message_type'],
+            'is_internal': row['is_internal'],
+        } for row in reversed(rows)]
+        return messages, (rows[-1]['id'] if has_older else None)
+
     def _prepare_portal_layout_values(self):
         values = super()._prepare_portal_layout_values()
         values['design_count'] = request.env['design.design'].search_count(self._get_designs_domain())
-        _logger.warning(f"[PORTAL] Portal layout - design_count: {values['design_count']}")
+        if self._designs_diagnostics_enabled():
+            _logger.debug(f"[PORTAL] Portal layout - design_count: {values['design_count']}")
         return values
     
     @route(['/my/design/approve'], type='http', auth="user", methods=['POST'], website=True, csrf=True)
+    @metrics.cronometrar('design_portal_request_seconds', route='approve_design')
+    @perfilar('portal.approve_design')
     def approve_design(self, design_id, message='', **post):
         """Aprobar diseño por parte del cliente"""
         try:
@@ -278,6 +582,8 @@ class DesignPortal(CustomerPortal):
             return request.redirect(f"/my/design/{design_id}?error=approval_error")
     
     @route(['/my/design/reject'], type='http', auth="user", methods=['POST'], website=True, csrf=True)
+    @metrics.cronometrar('design_portal_request_seconds', route='reject_design')
+    @perfilar('portal.reject_design')
     def reject_design(self, design_id, message='', **post):
         """Rechazar diseño por parte del cliente"""
         try:
@@ -291,6 +597,8 @@ class DesignPortal(CustomerPortal):
             return request.redirect('/my')
         
         try:
+            estado_anterior = design_sudo.state
+            transicion = request.env['design.state.transition'].sudo()._valores(design_sudo, 'rechazado')
             # Usar SQL directo para evitar restricciones del método write
             design_sudo.sudo().env.cr.execute("""
                 UPDATE design_design 
@@ -298,16 +606,20 @@ class DesignPortal(CustomerPortal):
                     rechazado = true,
                     aprobado_cliente = false,
                     observaciones_rechazo = %s,
-                    fecha_rechazo = NOW() AT TIME ZONE 'UTC'
+                    fecha_rechazo = NOW() AT TIME ZONE 'UTC',
+                    fecha_cambio_estado = %s
                 WHERE id = %s
                 RETURNING id
-            """, (message or "Cliente rechaza el diseño", design_sudo.id,))
+            """, (message or "Cliente rechaza el diseño", transicion['fecha'], design_sudo.id,))
+            request.env['design.state.transition'].sudo().create(transicion)
             
             # Invalidar la caché para asegurar que se vean los cambios
             design_sudo.invalidate_cache()
+            design_sudo._marcar_busqueda_texto()
+            metrics.incrementar(request.env, 'design_state_transitions_total', **{'from': estado_anterior, 'to': 'rechazado'})
             
             # Registrar en el historial
-            design_sudo.env['design.revision_log'].sudo().create({
+            design_sudo.env['design.revision_log'].sudo()._registrar({
                 'design_id': design_sudo.id,
                 'usuario_id': request.env.user.id,
                 'tipo': 'rechazo_cliente',
@@ -369,6 +681,8 @@ class DesignPortal(CustomerPortal):
             raise
     
     @route(['/my/design/<int:design_id>/message'], type='http', auth="user", methods=['POST'], website=True, csrf=True)
+    @metrics.cronometrar('design_portal_request_seconds', route='portal_design_message')
+    @perfilar('portal.portal_design_message')
     def portal_design_message(self, design_id, access_token=None, **kw):
         """Enviar mensaje desde el portal"""
         try:
@@ -395,6 +709,8 @@ class DesignPortal(CustomerPortal):
         return request.redirect(f'/my/design/{design_id}?access_token={access_token or design_sudo.access_token}')
 
     @route(['/my/design/<int:design_id>/comment'], type='http', auth="user", methods=['POST'], website=True, csrf=True)
+    @metrics.cronometrar('design_portal_request_seconds', route='portal_design_comment')
+    @perfilar('portal.portal_design_comment')
     def portal_design_comment(self, design_id, access_token=None, **kw):
         """Agregar comentario desde el portal"""
         try:
@@ -425,6 +741,8 @@ class DesignPortal(CustomerPortal):
         return request.redirect(f'/my/design/{design_id}?access_token={access_token or design_sudo.access_token}')
 
     @route(['/my/design/approve-with-changes'], type='http', auth="user", methods=['POST'], website=True, csrf=True)
+    @metrics.cronometrar('design_portal_request_seconds', route='approve_with_changes')
+    @perfilar('portal.approve_with_changes')
     def approve_with_changes(self, design_id, message='', **post):
         """Aprobar diseño con correcciones por parte del cliente"""
         try:
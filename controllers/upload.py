@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import psycopg2
+
+from odoo import http, _
+from odoo.http import request
+from odoo.exceptions import UserError, ValidationError
+
+from ..utils import metrics
+
+_logger = logging.getLogger(__name__)
+
+
+class DesignUpload(http.Controller):
+    """Subida por partes y reanudable de archivos de diseño.
+
+    API para clientes externos (integraciones, scripts): el wizard de subida
+    del backend sigue usando el campo binario y no depende de estas rutas.
+
+    1. POST /design/upload/init (json): crea la sesión y devuelve el token.
+    2. PUT /design/upload/<token>/chunk?offset=N con los bytes en el cuerpo.
+       Si se corta, GET /design/upload/<token> devuelve el offset desde donde seguir.
+    3. POST /design/upload/<token>/finalize (json): crea el design.image.
+    """
+
+    def _get_upload_session(self, token, lock=False):
+        session = request.env['design.upload.session'].search([
+            ('token', '=', token),
+            ('create_uid', '=', request.env.uid),
+        ], limit=1)
+        if not session:
+            raise request.not_found()
+        if lock:
+            # Dos partes de la misma sesión no pueden escribirse a la vez
+            request.env.cr.execute(
+                "SELECT id FROM design_upload_session WHERE id = %s FOR UPDATE NOWAIT", [session.id])
+        return session
+
+    def _upload_status(self, session):
+        return {
+            'token': session.token,
+            'offset': session._offset(),
+            'total_size': session.total_size,
+            'chunk_size': session._chunk_size(),
+            'state': session.state,
+            'image_id': session.image_id.id,
+        }
+
+    @http.route('/design/upload/init', type='json', auth='user', methods=['POST'])
+    def design_upload_init(self, design_id, filename, size, **kw):
+        design = request.env['design.design'].browse(int(design_id)).exists()
+        if not design:
+            raise request.not_found()
+        session = request.env['design.upload.session']._iniciar(design, filename, int(size))
+        _logger.info(f"Subida {session.token} iniciada para el diseño {design.id}: {filename} ({size} bytes)")
+        return self._upload_status(session)
+
+    @http.route('/design/upload/<string:token>', type='http', auth='user', methods=['GET'], sitemap=False)
+    def design_upload_status(self, token, **kw):
+        session = self._get_upload_session(token)
+        return request.make_json_response(self._upload_status(session), headers=[('Cache-Control', 'no-store')])
+
+    # Sin CSRF: un PUT entre orígenes exige preflight CORS, que no se habilita
+    @http.route('/design/upload/<string:token>/chunk', type='http', auth='user', methods=['PUT'],
+                csrf=False, sitemap=False)
+    def design_upload_chunk(self, token, offset=0, **kw):
+        try:
+            session = self._get_upload_session(token, lock=True)
+        except psycopg2.errors.LockNotAvailable:
+            return request.make_json_response({'error': _("Ya se está recibiendo otra parte de esta subida.")}, status=409)
+
+        try:
+            nuevo_offset = session._agregar_parte(int(offset), request.httprequest.stream)
+        except ValidationError as e:
+            return request.make_json_response({'error': str(e), 'offset': session._offset()}, status=422)
+        except UserError as e:
+            return request.make_json_response({'error': str(e), 'offset': session._offset()}, status=409)
+
+        metrics.incrementar(request.env, 'design_upload_bytes_total', nuevo_offset - int(offset))
+        return request.make_json_response(self._upload_status(session))
+
+    @http.route('/design/upload/<string:token>/finalize', type='json', auth='user', methods=['POST'])
+    def design_upload_finalize(self, token, **kw):
+        session = self._get_upload_session(token, lock=True)
+        image = session._finalizar()
+        return dict(self._upload_status(session), image_id=image.id)
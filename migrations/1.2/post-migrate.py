@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """Pasa los adjuntos anteriores a la deduplicación a design.image.blob y
+    corrige los tamaños heredados. Se ejecuta una sola vez, al actualizar desde
+    una versión anterior; una instalación nueva no tiene datos que migrar."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['design.image']._migrar_a_blobs()
+    env['design.image']._corregir_tamanos()
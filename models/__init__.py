@@ -6,3 +6,12 @@ from . import checklist_template_item
 from . import revision_log
 from . import design_image
 from . import res_partner
+from . import mail_mail
+from . import revision_log_archive
+from . import res_users
+from . import design_image_blob
+from . import design_upload_session
+from . import design_image_version
+from . import design_state_transition
+from . import design_cycle_stats
+from . import design_mail_queue
@@ -1,6 +1,9 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, AccessError
 from datetime import datetime
+from collections import defaultdict
+from ..utils import metrics
+from ..utils.profiling import perfilar
 
 class ChecklistItem(models.Model):
     _name = "design.checklist_item"
@@ -35,18 +38,59 @@ class ChecklistItem(models.Model):
                                               compute='_compute_user_permissions', 
                                               store=False)
 
+    # Campos que modifican los contadores de progreso del diseño
+    _counter_trigger_fields = ('design_id', 'etapa', 'validado_por_disenador', 'validado_por_validador')
+
+    def _aporte_contadores(self):
+        """Aporte de los ítems a los contadores: {(design_id, etapa): (total, diseñador, validador)}"""
+        aporte = defaultdict(lambda: [0, 0, 0])
+        for item in self:
+            if item.design_id and item.etapa in ('etapa1', 'etapa2'):
+                valores = aporte[(item.design_id.id, item.etapa)]
+                valores[0] += 1
+                valores[1] += int(item.validado_por_disenador)
+                valores[2] += int(item.validado_por_validador)
+        return aporte
+
     @api.depends('design_id')
     def _compute_user_permissions(self):
         """Calcula los permisos del usuario actual para usar en attrs de la vista"""
+        roles = self.env.user._get_design_roles()
         for record in self:
-            record.current_user_is_designer = self.env.user.has_group('ModuloDisenoOdoo.group_disenador')
-            record.current_user_is_validator = self.env.user.has_group('ModuloDisenoOdoo.group_validador')
+            record.current_user_is_designer = roles.designer
+            record.current_user_is_validator = roles.validator
+
+    def _validar_en_lote(self, campo):
+        """Marca como validados los ítems seleccionados con una sola escritura.
+
+        ChecklistItem.write registra el historial en un lote y reevalúa el estado una
+        vez por diseño afectado."""
+        pendientes = self.filtered(lambda item: not item[campo])
+        if pendientes:
+            pendientes.write({campo: True})
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': _("Se validaron %s ítems de %s diseños.", len(pendientes), len(pendientes.design_id)),
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
+
+    def action_validar_seleccion_disenador(self):
+        """Validación masiva como diseñador desde la mesa de checklist"""
+        return self._validar_en_lote('validado_por_disenador')
+
+    def action_validar_seleccion_validador(self):
+        """Validación masiva como validador desde la mesa de checklist"""
+        return self._validar_en_lote('validado_por_validador')
 
     @api.onchange('validado_por_disenador')
     def _onchange_validado_disenador(self):
         """Actualiza fecha y usuario cuando el diseñador valida"""
         if self.validado_por_disenador and not self.usuario_disenador:
-            if not self.env.user.has_group('ModuloDisenoOdoo.group_disenador'):
+            if not self.env.user._get_design_roles().designer:
                 raise ValidationError(_("Solo los diseñadores pueden validar este campo."))
             self.fecha_disenador = fields.Datetime.now()
             self.usuario_disenador = self.env.user
@@ -55,19 +99,21 @@ class ChecklistItem(models.Model):
     def _onchange_validado_validador(self):
         """Actualiza fecha y usuario cuando el validador valida"""
         if self.validado_por_validador and not self.usuario_validador:
-            if not self.env.user.has_group('ModuloDisenoOdoo.group_validador'):
+            if not self.env.user._get_design_roles().validator:
                 raise ValidationError(_("Solo los validadores pueden validar este campo."))
             self.fecha_validador = fields.Datetime.now()
             self.usuario_validador = self.env.user
 
+    @perfilar('checklist_item.write')
     def write(self, vals):
         """Control de permisos y registro de cambios"""
         
-        # Verificar permisos antes de escribir
+        # Verificar permisos antes de escribir (roles resueltos una sola vez)
+        roles = self.env.user._get_design_roles()
         for record in self:
             # Control para validado_por_disenador
             if 'validado_por_disenador' in vals:
-                if not self.env.user.has_group('ModuloDisenoOdoo.group_disenador'):
+                if not roles.designer:
                     raise AccessError(_("Solo los diseñadores pueden marcar items como validados por diseñador."))
                 
                 # Si se está marcando como validado, actualizar fecha y usuario
@@ -77,7 +123,7 @@ class ChecklistItem(models.Model):
 
             # Control para validado_por_validador  
             if 'validado_por_validador' in vals:
-                if not self.env.user.has_group('ModuloDisenoOdoo.group_validador'):
+                if not roles.validator:
                     raise AccessError(_("Solo los validadores pueden marcar items como validados por validador."))
                 
                 # Si se está marcando como validado, actualizar fecha y usuario
@@ -85,16 +131,29 @@ class ChecklistItem(models.Model):
                     vals['fecha_validador'] = fields.Datetime.now()
                     vals['usuario_validador'] = self.env.user.id
 
+        # Aporte a los contadores del diseño antes de escribir
+        afecta_contadores = any(field in vals for field in self._counter_trigger_fields)
+        aporte_anterior = self._aporte_contadores() if afecta_contadores else None
+
         # Ejecutar la escritura
         res = super(ChecklistItem, self).write(vals)
 
+        if afecta_contadores:
+            self.env['design.design']._aplicar_delta_contadores(self._aporte_contadores(), aporte_anterior)
+        if 'name' in vals or 'comentario' in vals or 'design_id' in vals:
+            self.design_id._marcar_busqueda_texto()
+
+        for campo, rol in (('validado_por_disenador', 'disenador'), ('validado_por_validador', 'validador')):
+            if vals.get(campo):
+                metrics.incrementar(self.env, 'design_checklist_toggles_total', len(self), rol=rol)
+
         # Registrar en el historial después de la escritura
         for item in self:
             design = item.design_id
 
             # Registrar validación del diseñador
             if vals.get('validado_por_disenador') and item.usuario_disenador == self.env.user:
-                self.env['design.revision_log'].create({
+                self.env['design.revision_log']._registrar({
                     'design_id': design.id,
                     'usuario_id': self.env.user.id,
                     'observaciones': f"Ítem validado por diseñador: {item.name}",
@@ -103,7 +162,7 @@ class ChecklistItem(models.Model):
 
             # Registrar validación del validador
             if vals.get('validado_por_validador') and item.usuario_validador == self.env.user:
-                self.env['design.revision_log'].create({
+                self.env['design.revision_log']._registrar({
                     'design_id': design.id,
                     'usuario_id': self.env.user.id,
                     'observaciones': f"Ítem validado por validador: {item.name}",
@@ -112,7 +171,7 @@ class ChecklistItem(models.Model):
 
             # Registrar cambios en comentarios
             if 'comentario' in vals:
-                self.env['design.revision_log'].create({
+                self.env['design.revision_log']._registrar({
                     'design_id': design.id,
                     'usuario_id': self.env.user.id,
                     'observaciones': f"Comentario actualizado en ítem '{item.name}': {vals['comentario']}",
@@ -121,25 +180,24 @@ class ChecklistItem(models.Model):
 
         # Verificar si se completó el checklist después de los cambios
         if 'validado_por_disenador' in vals or 'validado_por_validador' in vals:
-            for item in self:
-                if item.design_id:
-                    item.design_id._compute_estado_checklist()
+            self.design_id._compute_estado_checklist()
 
         return res
 
-    @api.model
-    def create(self, vals):
-        """Crear item con controles de permisos"""
-        result = super(ChecklistItem, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Crear items con controles de permisos"""
+        result = super(ChecklistItem, self).create(vals_list)
+        self.env['design.design']._aplicar_delta_contadores(result._aporte_contadores())
+        result.design_id._marcar_busqueda_texto()
         
-        # Registrar creación en el historial
-        if result.design_id:
-            self.env['design.revision_log'].create({
-                'design_id': result.design_id.id,
-                'usuario_id': self.env.user.id,
-                'observaciones': f"Ítem de checklist creado: {result.name}",
-                'tipo': 'creacion',
-            })
+        # Registrar creación en el historial (una sola inserción para todos los ítems)
+        self.env['design.revision_log']._registrar([{
+            'design_id': item.design_id.id,
+            'usuario_id': self.env.user.id,
+            'observaciones': f"Ítem de checklist creado: {item.name}",
+            'tipo': 'creacion',
+        } for item in result if item.design_id])
         
         return result
 
@@ -147,11 +205,16 @@ class ChecklistItem(models.Model):
         """Eliminar items con registro en historial"""
         for record in self:
             if record.design_id:
-                self.env['design.revision_log'].create({
+                self.env['design.revision_log']._registrar({
                     'design_id': record.design_id.id,
                     'usuario_id': self.env.user.id,
                     'observaciones': f"Ítem de checklist eliminado: {record.name}",
                     'tipo': 'eliminacion',
                 })
         
-        return super(ChecklistItem, self).unlink()
\ No newline at end of file
+        aporte_anterior = self._aporte_contadores()
+        designs = self.design_id
+        res = super(ChecklistItem, self).unlink()
+        designs.exists()._marcar_busqueda_texto()
+        self.env['design.design']._aplicar_delta_contadores({}, aporte_anterior)
+        return res
\ No newline at end of file
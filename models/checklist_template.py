@@ -1,6 +1,6 @@
 # design.checklist_template.py
 
-from odoo import models, fields
+from odoo import models, fields, api, tools
 
 class ChecklistTemplate(models.Model):
     _name = "design.checklist_template"
@@ -19,3 +19,60 @@ class ChecklistTemplate(models.Model):
     ], string="Etapa", required=True)
 
     item_ids = fields.One2many("design.checklist_template_item", "template_id", string="Items de la plantilla")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.clear_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self.clear_caches()
+        return super().write(vals)
+
+    def unlink(self):
+        self.clear_caches()
+        return super().unlink()
+
+    @api.model
+    @tools.ormcache('categoria_id', 'etapa')
+    def _get_compiled_items(self, categoria_id, etapa):
+        """Devuelve los ítems de la plantilla de (categoría, etapa) como tuplas ordenadas
+        (name, orden, comentario_default), o None si no hay plantilla.
+
+        El resultado queda en caché del worker hasta que se modifica una plantilla o uno
+        de sus ítems."""
+        template = self.sudo().search([
+            ('categoria_id', '=', categoria_id),
+            ('etapa', '=', etapa)
+        ], limit=1)
+        if not template:
+            return None
+        return tuple(
+            (item.name, item.orden, item.comentario_default or '')
+            for item in template.item_ids.sorted(key=lambda x: (x.orden, x.id))
+        )
+
+    @api.model
+    def _instanciar_checklist(self, designs, etapa):
+        """Crea con una sola inserción los ítems de la plantilla de cada diseño para la etapa.
+
+        Returns:
+            design.design: diseños para los que existía plantilla
+        """
+        vals_list = []
+        con_plantilla = designs.browse()
+        for design in designs:
+            items = self._get_compiled_items(design.categoria_id.id, etapa)
+            if items is None:
+                continue
+            con_plantilla |= design
+            vals_list.extend({
+                'name': name,
+                'design_id': design.id,
+                'etapa': etapa,
+                'orden': orden,
+                'comentario': comentario,
+            } for name, orden, comentario in items)
+        if vals_list:
+            self.env['design.checklist_item'].create(vals_list)
+        return con_plantilla
@@ -1,4 +1,4 @@
-from odoo import models, fields
+from odoo import models, fields, api
 
 class ChecklistTemplateItem(models.Model):
     _name = "design.checklist_template_item"
@@ -9,3 +9,17 @@ class ChecklistTemplateItem(models.Model):
     template_id = fields.Many2one("design.checklist_template", string="Plantilla", required=True, ondelete="cascade")
     orden = fields.Integer("Orden", default=1)
     comentario_default = fields.Text("Comentario por defecto (opcional)")
+
+    # Cualquier cambio invalida la caché de plantillas compiladas
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.clear_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self.clear_caches()
+        return super().write(vals)
+
+    def unlink(self):
+        self.clear_caches()
+        return super().unlink()
@@ -1,8 +1,14 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import AccessError, UserError
 from odoo.exceptions import ValidationError, UserError
-from datetime import datetime
+from odoo.tools import str2bool
+from ..utils import metrics
+from ..utils.profiling import perfilar
+from collections import defaultdict
+from datetime import datetime, timedelta
+from markupsafe import Markup
 import logging
+import threading
 
 _logger = logging.getLogger(__name__)
 
@@ -14,12 +20,11 @@ class Design(models.Model):
     
     def unlink(self):
         """Sobrescribir para controlar la eliminación de diseños"""
+        if not self.env.user._get_design_roles().admin:
+            raise AccessError(_("Solo los administradores pueden eliminar diseños."))
         for record in self:
-            if not self.env.user.has_group('base.group_system'):
-                raise AccessError(_("Solo los administradores pueden eliminar diseños."))
-            
             # Registrar en el historial
-            self.env['design.revision_log'].create({
+            self.env['design.revision_log']._registrar({
                 'design_id': record.id,
                 'usuario_id': self.env.user.id,
                 'observaciones': "Diseño eliminado",
@@ -30,7 +35,7 @@ class Design(models.Model):
         
     def action_delete_designs(self):
         """Acción para eliminar múltiples diseños desde la vista de lista"""
-        if not self.env.user.has_group('base.group_system'):
+        if not self.env.user._get_design_roles().admin:
             raise AccessError(_("Solo los administradores pueden eliminar diseños."))
             
         # Verificar si hay algún registro seleccionado
@@ -47,6 +52,28 @@ class Design(models.Model):
             'context': {'default_design_ids': self.ids, 'default_count': len(self)},
         }
     
+    # Contadores de progreso del checklist por etapa, mantenidos incrementalmente
+    # desde design.checklist_item (create, write y unlink)
+    checklist_total_etapa1 = fields.Integer("Ítems etapa 1", readonly=True, copy=False, default=0)
+    checklist_disenador_etapa1 = fields.Integer("Validados por diseñador etapa 1", readonly=True, copy=False, default=0)
+    checklist_validador_etapa1 = fields.Integer("Validados por validador etapa 1", readonly=True, copy=False, default=0)
+    checklist_total_etapa2 = fields.Integer("Ítems etapa 2", readonly=True, copy=False, default=0)
+    checklist_disenador_etapa2 = fields.Integer("Validados por diseñador etapa 2", readonly=True, copy=False, default=0)
+    checklist_validador_etapa2 = fields.Integer("Validados por validador etapa 2", readonly=True, copy=False, default=0)
+
+    _checklist_counter_fields = [
+        'checklist_total_etapa1', 'checklist_disenador_etapa1', 'checklist_validador_etapa1',
+        'checklist_total_etapa2', 'checklist_disenador_etapa2', 'checklist_validador_etapa2',
+    ]
+
+    # Diseños con el checklist de la etapa actual completo por el diseñador y pendiente del validador
+    pendiente_validacion = fields.Boolean(
+        'Pendiente de validación',
+        compute='_compute_pendiente_validacion',
+        store=True,
+        index=True
+    )
+
     # Campo calculado para verificar si la etapa 1 está completa
     etapa1_completa = fields.Boolean(
         'Etapa 1 Completa',
@@ -54,14 +81,324 @@ class Design(models.Model):
         store=True
     )
 
-    @api.depends('checklist_ids.validado_por_disenador', 'checklist_ids.etapa')
+    def init(self):
+        """Recalcula los contadores del checklist a partir de los ítems existentes"""
+        self.env.cr.execute("""
+            UPDATE design_design d
+               SET checklist_total_etapa1 = c.total_etapa1,
+                   checklist_disenador_etapa1 = c.disenador_etapa1,
+                   checklist_validador_etapa1 = c.validador_etapa1,
+                   checklist_total_etapa2 = c.total_etapa2,
+                   checklist_disenador_etapa2 = c.disenador_etapa2,
+                   checklist_validador_etapa2 = c.validador_etapa2
+              FROM (
+                SELECT d2.id,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa1') AS total_etapa1,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa1' AND i.validado_por_disenador) AS disenador_etapa1,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa1' AND i.validado_por_validador) AS validador_etapa1,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa2') AS total_etapa2,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa2' AND i.validado_por_disenador) AS disenador_etapa2,
+                       COUNT(i.id) FILTER (WHERE i.etapa = 'etapa2' AND i.validado_por_validador) AS validador_etapa2
+                  FROM design_design d2
+             LEFT JOIN design_checklist_item i ON i.design_id = d2.id
+              GROUP BY d2.id
+             ) c
+             WHERE c.id = d.id
+        """)
+        self.env.cr.execute("""
+            UPDATE design_design
+               SET pendiente_validacion = CASE
+                       WHEN etapa = 'etapa1' THEN checklist_total_etapa1 > 0
+                            AND checklist_disenador_etapa1 = checklist_total_etapa1
+                            AND checklist_validador_etapa1 < checklist_total_etapa1
+                       WHEN etapa = 'etapa2' THEN checklist_total_etapa2 > 0
+                            AND checklist_disenador_etapa2 = checklist_total_etapa2
+                            AND checklist_validador_etapa2 < checklist_total_etapa2
+                       ELSE FALSE
+                   END,
+                   etapa1_completa = checklist_total_etapa1 > 0
+                       AND checklist_disenador_etapa1 = checklist_total_etapa1
+        """)
+        self._init_busqueda_texto()
+        self._init_indice_sla()
+
+    # Búsqueda de texto completo: columna tsvector (fuera del ORM) con índice GIN.
+    # Se mantiene por diseño al final de la transacción (_actualizar_busqueda_texto)
+    _search_config = 'spanish'
+    _search_buffer_key = 'design.design.search_dirty'
+    # Campos propios cuyo cambio obliga a recalcular el vector
+    _search_trigger_fields = ('name', 'cliente_id', 'comentario_validador', 'comentario_disenador', 'observaciones_rechazo')
+
+    def _init_busqueda_texto(self):
+        cr = self.env.cr
+        cr.execute("ALTER TABLE design_design ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        cr.execute("""
+            CREATE INDEX IF NOT EXISTS design_design_search_vector_idx
+                ON design_design USING GIN (search_vector)
+        """)
+        self._actualizar_vectores_sql("d.search_vector IS NULL", [])
+
+    def _actualizar_vectores_sql(self, condicion, params):
+        """Recalcula search_vector de los diseños que cumplen `condicion` (sobre el alias d).
+
+        Pesos: A nombre y cliente, B comentarios y observaciones, C ítems del
+        checklist, D comentarios del chatter (sin etiquetas HTML)."""
+        self.env.cr.execute(f"""
+            UPDATE design_design d
+               SET search_vector =
+                       setweight(to_tsvector(%(cfg)s::regconfig, COALESCE(d.name, '') || ' ' || COALESCE(p.name, '')), 'A')
+                    || setweight(to_tsvector(%(cfg)s::regconfig,
+                           COALESCE(d.comentario_validador, '') || ' ' || COALESCE(d.comentario_disenador, '')
+                           || ' ' || COALESCE(d.observaciones_rechazo, '')), 'B')
+                    || setweight(to_tsvector(%(cfg)s::regconfig, COALESCE((
+                           SELECT string_agg(COALESCE(i.name, '') || ' ' || COALESCE(i.comentario, ''), ' ')
+                             FROM design_checklist_item i
+                            WHERE i.design_id = d.id), '')), 'C')
+                    || setweight(to_tsvector(%(cfg)s::regconfig, COALESCE((
+                           SELECT string_agg(regexp_replace(m.body, '<[^>]*>', ' ', 'g'), ' ')
+                             FROM mail_message m
+                            WHERE m.model = 'design.design'
+                              AND m.res_id = d.id
+                              AND m.message_type = 'comment'), '')), 'D')
+              FROM res_partner p
+             WHERE p.id = d.cliente_id
+               AND {condicion}
+        """, dict(params, cfg=self._search_config))
+
+    def _marcar_busqueda_texto(self):
+        """Agenda la actualización del vector de búsqueda de estos diseños para el precommit"""
+        if not self.ids:
+            return
+        precommit = self.env.cr.precommit
+        pendientes = precommit.data.get(self._search_buffer_key)
+        if pendientes is None:
+            pendientes = precommit.data[self._search_buffer_key] = set()
+            precommit.add(self._actualizar_busqueda_texto)
+        pendientes.update(self.ids)
+
+    @api.model
+    def _actualizar_busqueda_texto(self):
+        pendientes = self.env.cr.precommit.data.pop(self._search_buffer_key, None)
+        if not pendientes:
+            return
+        self.env.flush_all()
+        self._actualizar_vectores_sql("d.id = ANY(%(ids)s)", {'ids': list(pendientes)})
+
+    @api.model
+    def _tsquery_sql(self):
+        return "websearch_to_tsquery(%s::regconfig, %s)"
+
+    def _search_texto_busqueda(self, operator, value):
+        if operator not in ('=', 'ilike') or not value:
+            return []
+        return [('id', 'inselect', (
+            f"SELECT id FROM design_design WHERE search_vector @@ {self._tsquery_sql()}",
+            [self._search_config, value],
+        ))]
+
+    def _compute_texto_busqueda(self):
+        self.texto_busqueda = False
+
+    @api.model
+    def _buscar_por_relevancia(self, domain, texto, limit=None, offset=0):
+        """Ids de los diseños del dominio que coinciden con `texto`, ordenados por relevancia.
+
+        Aplica las reglas de acceso del usuario como un search normal."""
+        self.check_access_rights('read')
+        if ('texto_busqueda', '=', texto) not in domain:
+            domain = domain + [('texto_busqueda', '=', texto)]
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+        sql = f"""
+            SELECT design_design.id
+              FROM {from_clause}
+             WHERE {where_clause or 'TRUE'}
+          ORDER BY ts_rank_cd(design_design.search_vector, {self._tsquery_sql()}) DESC, design_design.id DESC
+        """
+        params = list(where_params) + [self._search_config, texto]
+        if limit:
+            sql += " LIMIT %s OFFSET %s"
+            params += [limit, offset]
+        self.env.cr.execute(sql, params)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    # Recordatorios de SLA: estado -> parámetro con el umbral en horas
+    _sla_umbrales = {
+        'cliente': 'ModuloDisenoOdoo.sla_cliente_horas',
+        'validacion': 'ModuloDisenoOdoo.sla_validacion_horas',
+        'correcciones_solicitadas': 'ModuloDisenoOdoo.sla_correcciones_horas',
+    }
+    # Diseños listados por estado en cada recordatorio (el resto se resume)
+    _sla_max_listados = 50
+
+    def _init_indice_sla(self):
+        estados = ', '.join(f"'{estado}'" for estado in self._sla_umbrales)
+        self.env.cr.execute(f"""
+            CREATE INDEX IF NOT EXISTS design_design_sla_idx
+                ON design_design (state, fecha_cambio_estado, id)
+             WHERE state IN ({estados})
+        """)
+
+    def _destinatarios_sla(self, estado, validadores):
+        """Partners a recordar para un diseño demorado en `estado`"""
+        self.ensure_one()
+        if estado == 'cliente':
+            return self.cliente_id
+        if estado == 'validacion':
+            return validadores
+        return self.create_uid.partner_id
+
+    @api.model
+    def _cron_recordatorios_sla(self, chunk_size=None):
+        """Envía un recordatorio agrupado por destinatario con los diseños demorados.
+
+        Cada tramo vuelve a consultar (sobre el índice parcial (state,
+        fecha_cambio_estado, id)) hasta `chunk_size` diseños vencidos y aún sin
+        recordatorio, encola un único correo por destinatario para ese tramo, marca
+        el recordatorio de sus diseños y confirma la transacción. Los diseños ya
+        marcados salen de la consulta, así que si el cron se interrumpe la próxima
+        ejecución sigue desde el último tramo confirmado."""
+        params = self.env['ir.config_parameter'].sudo()
+        chunk_size = chunk_size or int(params.get_param('ModuloDisenoOdoo.sla_chunk_size', 500))
+        repetir = int(params.get_param('ModuloDisenoOdoo.sla_repetir_horas', 24))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        ahora = fields.Datetime.now()
+        limite_repeticion = ahora - timedelta(hours=repetir)
+        validadores = self.env.ref('ModuloDisenoOdoo.group_validador').users.partner_id
+        Design = self.sudo()
+
+        condiciones, args = [], []
+        for estado, param in self._sla_umbrales.items():
+            horas = int(params.get_param(param, 0) or 0)
+            if horas > 0:
+                condiciones.append("(state = %s AND fecha_cambio_estado < %s)")
+                args += [estado, ahora - timedelta(hours=horas)]
+        if not condiciones:
+            return True
+
+        estados = dict(self._fields['state'].selection)
+        base_url = self.get_base_url()
+        total = 0
+        while True:
+            self.flush_model(['state', 'fecha_cambio_estado', 'fecha_recordatorio_sla'])
+            self.env.cr.execute(f"""
+                SELECT id
+                  FROM design_design
+                 WHERE ({' OR '.join(condiciones)})
+                   AND COALESCE(fecha_recordatorio_sla, '-infinity') < GREATEST(fecha_cambio_estado, %s)
+              ORDER BY fecha_cambio_estado, id
+                 LIMIT %s
+            """, args + [limite_repeticion, chunk_size])
+            design_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not design_ids:
+                break
+
+            # Destinatario -> estado -> diseños del tramo
+            pendientes = defaultdict(lambda: defaultdict(list))
+            for design in Design.browse(design_ids):
+                for partner in design._destinatarios_sla(design.state, validadores):
+                    pendientes[partner.id][design.state].append(design.id)
+
+            for partner in self.env['res.partner'].sudo().browse(list(pendientes)):
+                interno = bool(partner.user_ids.filtered(lambda user: not user.share))
+                grupos = []
+                for estado, ids in pendientes[partner.id].items():
+                    disenos = Design.browse(ids[:self._sla_max_listados])
+                    grupos.append({
+                        'estado': estados[estado],
+                        'disenos': [{
+                            'name': design.name,
+                            'url': f"{base_url}/web#id={design.id}&model=design.design&view_type=form"
+                                   if interno else f"{base_url}{design.access_url}",
+                            'dias': (ahora - design.fecha_cambio_estado).days,
+                        } for design in disenos],
+                        'restantes': max(len(ids) - self._sla_max_listados, 0),
+                    })
+                    metrics.incrementar(self.env, 'design_sla_reminders_total', estado=estado)
+                body = self.env['ir.qweb']._render('ModuloDisenoOdoo.recordatorio_sla_body', {
+                    'partner': partner,
+                    'grupos': grupos,
+                })
+                self.env['mail.mail'].sudo().create({
+                    'subject': _("Diseños pendientes de acción"),
+                    'body_html': body,
+                    'recipient_ids': [(4, partner.id)],
+                    'email_from': self.env.company.email_formatted or self.env.user.email_formatted,
+                    'model': self._name,
+                    'auto_delete': True,
+                })
+                metrics.incrementar(self.env, 'design_mail_enqueued_total', template='recordatorio_sla')
+
+            # Se marca todo el tramo (también los diseños sin destinatario) para que
+            # la siguiente consulta avance
+            self.env.cr.execute(
+                "UPDATE design_design SET fecha_recordatorio_sla = %s WHERE id = ANY(%s)",
+                (ahora, design_ids))
+            Design.invalidate_model()
+            total += len(design_ids)
+            _logger.info(f"Recordatorios de SLA: tramo de {len(design_ids)} diseños, {len(pendientes)} destinatarios")
+            if auto_commit:
+                self.env.cr.commit()
+        if total:
+            _logger.info(f"Recordatorios de SLA: {total} diseños recordados")
+        return True
+
+    def _contadores_checklist(self, etapa=None):
+        """Devuelve (total, validados por diseñador, validados por validador) de la etapa.
+
+        Sin etapa se suman las dos etapas."""
+        self.ensure_one()
+        etapas = [etapa] if etapa else ['etapa1', 'etapa2']
+        total = disenador = validador = 0
+        for etapa in etapas:
+            if etapa not in ('etapa1', 'etapa2'):
+                continue
+            total += self[f'checklist_total_{etapa}']
+            disenador += self[f'checklist_disenador_{etapa}']
+            validador += self[f'checklist_validador_{etapa}']
+        return total, disenador, validador
+
+    @api.model
+    def _aplicar_delta_contadores(self, nuevo, anterior=None):
+        """Aplica a los contadores la diferencia entre dos aportes de ítems.
+
+        Los aportes son diccionarios {(design_id, etapa): (total, diseñador, validador)}
+        generados por design.checklist_item._aporte_contadores()."""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for signo, aporte in ((1, nuevo), (-1, anterior or {})):
+            for (design_id, etapa), (total, disenador, validador) in aporte.items():
+                deltas[design_id][f'checklist_total_{etapa}'] += signo * total
+                deltas[design_id][f'checklist_disenador_{etapa}'] += signo * disenador
+                deltas[design_id][f'checklist_validador_{etapa}'] += signo * validador
+
+        design_ids = []
+        for design_id, columnas in deltas.items():
+            columnas = {columna: delta for columna, delta in columnas.items() if delta}
+            if not columnas:
+                continue
+            asignaciones = ', '.join(f'{columna} = {columna} + %s' for columna in columnas)
+            self.env.cr.execute(
+                f"UPDATE design_design SET {asignaciones} WHERE id = %s RETURNING id",
+                [*columnas.values(), design_id])
+            # El diseño puede no existir si se eliminó en la misma operación
+            design_ids.extend(row[0] for row in self.env.cr.fetchall())
+
+        designs = self.browse(design_ids)
+        designs.invalidate_recordset(self._checklist_counter_fields)
+        designs.modified(self._checklist_counter_fields)
+
+    @api.depends('etapa', *_checklist_counter_fields)
+    def _compute_pendiente_validacion(self):
+        for record in self:
+            total, disenador, validador = record._contadores_checklist(record.etapa)
+            record.pendiente_validacion = bool(total) and disenador == total and validador < total
+
+    @api.depends('checklist_total_etapa1', 'checklist_disenador_etapa1')
     def _compute_etapa1_completa(self):
         for record in self:
-            items_etapa1 = record.checklist_ids.filtered(lambda x: x.etapa == 'etapa1')
-            if not items_etapa1:
-                record.etapa1_completa = False
-            else:
-                record.etapa1_completa = all(item.validado_por_disenador for item in items_etapa1)
+            total, disenador, _validador = record._contadores_checklist('etapa1')
+            record.etapa1_completa = bool(total) and disenador == total
 
     # Lista de campos que se pueden editar después de subir el diseño
     _fields_editables_after_upload = [
@@ -93,10 +430,18 @@ class Design(models.Model):
     observaciones_rechazo = fields.Text("Observaciones de rechazo")
 
     historial_ids = fields.One2many("design.revision_log", "design_id", string="Historial de validaciones")
+    historial_archivado_count = fields.Integer("Entradas archivadas", compute='_compute_historial_archivado_count')
+    # Filtro de texto completo (nombre, cliente, comentarios, checklist y chatter)
+    texto_busqueda = fields.Char("Texto", compute='_compute_texto_busqueda', search='_search_texto_busqueda')
+    version_ids = fields.One2many("design.image.version", "design_id", string="Versiones anteriores")
+    version_count = fields.Integer("Versiones anteriores", compute='_compute_version_count')
 
     fecha_aprobacion_cliente = fields.Datetime("Fecha de aprobación del cliente", readonly=True)
     fecha_rechazo = fields.Datetime("Fecha de rechazo", readonly=True)
     fecha_estado_cliente = fields.Datetime("Fecha cuando pasó a estado cliente", readonly=True)
+    fecha_cambio_estado = fields.Datetime("Fecha del último cambio de estado", readonly=True, index=True,
+                                          default=fields.Datetime.now)
+    fecha_recordatorio_sla = fields.Datetime("Último recordatorio de SLA", readonly=True, copy=False)
 
     state = fields.Selection([
         ('borrador', 'Borrador'),
@@ -134,22 +479,53 @@ class Design(models.Model):
         'Portal URL', compute='_compute_access_url',
         help='URL para que el usuario pueda acceder a este objeto a través del portal.')
 
-    def _compute_access_url(self):
+    def _compute_historial_archivado_count(self):
+        data = self.env['design.revision_log_archive'].read_group(
+            [('design_id', 'in', self.ids)], ['cantidad:sum'], ['design_id'])
+        counts = {item['design_id'][0]: item['cantidad'] for item in data}
         for record in self:
-            record.access_url = f'/my/design/{record.id}'
-    
-    def _compute_user_roles(self):
+            record.historial_archivado_count = counts.get(record.id, 0)
+
+    def _compute_version_count(self):
+        data = self.env['design.image.version'].read_group(
+            [('design_id', 'in', self.ids)], ['design_id'], ['design_id'])
+        counts = {item['design_id'][0]: item['design_id_count'] for item in data}
         for record in self:
-            record.is_designer = self.env.user.has_group('ModuloDisenoOdoo.group_disenador')
-            record.is_validator = self.env.user.has_group('ModuloDisenoOdoo.group_validador')
+            record.version_count = counts.get(record.id, 0)
 
-    is_designer = fields.Boolean(compute='_compute_user_roles', string='Is Designer')
-    is_validator = fields.Boolean(compute='_compute_user_roles', string='Is Validator')
+    def action_ver_versiones(self):
+        """Abre las versiones de archivos archivadas en almacenamiento frío"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Versiones anteriores'),
+            'res_model': 'design.image.version',
+            'view_mode': 'tree,form',
+            'domain': [('design_id', '=', self.id)],
+            'context': {'default_design_id': self.id},
+        }
+
+    def action_ver_historial_archivado(self):
+        """Abre los resúmenes mensuales archivados del historial de este diseño"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Historial archivado'),
+            'res_model': 'design.revision_log_archive',
+            'view_mode': 'tree,form',
+            'domain': [('design_id', '=', self.id)],
+            'context': {'default_design_id': self.id},
+        }
 
+    def _compute_access_url(self):
+        for record in self:
+            record.access_url = f'/my/design/{record.id}'
+    
     def _compute_user_roles(self):
+        roles = self.env.user._get_design_roles()
         for record in self:
-            record.is_designer = self.env.user.has_group('ModuloDisenoOdoo.group_disenador')
-            record.is_validator = self.env.user.has_group('ModuloDisenoOdoo.group_validador')
+            record.is_designer = roles.designer
+            record.is_validator = roles.validator
 
     def _cargar_checklist_etapa(self):
         """
@@ -161,13 +537,9 @@ class Design(models.Model):
         """
         self.ensure_one()
         
-        # Buscar plantilla para la categoría y etapa actual
-        template = self.env['design.checklist_template'].search([
-            ('categoria_id', '=', self.categoria_id.id),
-            ('etapa', '=', self.etapa)
-        ], limit=1)
-        
-        if not template:
+        # Buscar plantilla para la categoría y etapa actual (caché de plantillas compiladas)
+        ChecklistTemplate = self.env['design.checklist_template']
+        if ChecklistTemplate._get_compiled_items(self.categoria_id.id, self.etapa) is None:
             _logger.info(f"No se encontró plantilla de checklist para la categoría {self.categoria_id.name} y etapa {self.etapa}")
             return False
             
@@ -176,13 +548,7 @@ class Design(models.Model):
             self.checklist_ids.filtered(lambda x: x.etapa == self.etapa).unlink()
             
             # Crear nuevos items basados en la plantilla
-            for item_template in template.item_ids:
-                self.env['design.checklist_item'].create({
-                    'name': item_template.name,
-                    'design_id': self.id,
-                    'etapa': self.etapa,
-                    'orden': item_template.orden,
-                })
+            ChecklistTemplate._instanciar_checklist(self, self.etapa)
                 
             _logger.info(f"Se cargó la plantilla de checklist para la etapa {self.etapa}")
             return True
@@ -200,13 +566,11 @@ class Design(models.Model):
         """
         self.ensure_one()
         
-        # Buscar plantilla de etapa 2 primero
-        template = self.env['design.checklist_template'].search([
-            ('categoria_id', '=', self.categoria_id.id),
-            ('etapa', '=', 'etapa2')
-        ], limit=1)
+        # Buscar plantilla de etapa 2 primero (caché de plantillas compiladas)
+        ChecklistTemplate = self.env['design.checklist_template']
+        items_etapa2 = ChecklistTemplate._get_compiled_items(self.categoria_id.id, 'etapa2')
         
-        if template:
+        if items_etapa2 is not None:
             # Si existe plantilla de etapa 2: eliminar items de etapa 1 y cargar etapa 2
             items_etapa1 = self.checklist_ids.filtered(lambda x: x.etapa == 'etapa1')
             if items_etapa1:
@@ -214,16 +578,9 @@ class Design(models.Model):
                 _logger.info(f"Eliminados {len(items_etapa1)} items de checklist de etapa 1")
             
             # Crear items de etapa 2
-            for item_template in template.item_ids.sorted(lambda x: x.orden):
-                self.env['design.checklist_item'].create({
-                    'name': item_template.name,
-                    'design_id': self.id,
-                    'etapa': 'etapa2',
-                    'orden': item_template.orden,
-                    'comentario': item_template.comentario_default or '',
-                })
+            ChecklistTemplate._instanciar_checklist(self, 'etapa2')
             
-            _logger.info(f"Cargados {len(template.item_ids)} items de checklist para etapa 2")
+            _logger.info(f"Cargados {len(items_etapa2)} items de checklist para etapa 2")
             self.message_post(body="Diseño aprobado por cliente. Se ha cargado el checklist de Etapa 2.")
         else:
             # Si NO existe plantilla de etapa 2: mantener items de etapa 1
@@ -234,12 +591,12 @@ class Design(models.Model):
         self.etapa = 'etapa2'
         return True
 
-    @api.depends('checklist_ids.validado_por_disenador', 'checklist_ids.validado_por_validador')
     def _compute_estado_checklist(self):
+        """Avanza el estado según los contadores del checklist de la etapa actual"""
         for record in self:
-            checklist = record.checklist_ids.filtered(lambda x: x.etapa == record.etapa)
-            completo_disenador = checklist and all(item.validado_por_disenador for item in checklist)
-            completo_validador = checklist and all(item.validado_por_validador for item in checklist)
+            total, disenador, validador = record._contadores_checklist(record.etapa)
+            completo_disenador = bool(total) and disenador == total
+            completo_validador = bool(total) and validador == total
 
             if completo_disenador and record.state == 'borrador':
                 record.state = 'validacion'
@@ -251,23 +608,47 @@ class Design(models.Model):
                 record.message_post(body="Checklist validado por el validador. Diseño enviado al cliente para aprobación.")
                 record._notificar_a_disenador()
 
+    def _enviar_plantilla(self, template, email_values=None):
+        """Encola el correo de la plantilla para este diseño.
+
+        Por defecto solo se guarda una entrada en design.mail.queue: el cron de
+        correos de diseños renderiza la plantilla y entrega el correo fuera de la
+        transacción del usuario. Con el parámetro ``ModuloDisenoOdoo.mail_force_send``
+        activo se renderiza y envía inmediatamente."""
+        self.ensure_one()
+        force_send = str2bool(self.env['ir.config_parameter'].sudo().get_param(
+            'ModuloDisenoOdoo.mail_force_send', 'False'))
+        if force_send:
+            mail_id = template.send_mail(self.id, force_send=True, email_values=email_values)
+            if self.env['mail.mail'].sudo().browse(mail_id)._contar_enviados():
+                metrics.incrementar(self.env, 'design_mail_sent_total', template=template.id)
+            return mail_id
+        metrics.incrementar(self.env, 'design_mail_enqueued_total', template=template.id)
+        queue = self.env['design.mail.queue'].sudo().create(
+            self.env['design.mail.queue']._valores(template, self, email_values))
+        cron = self.env.ref('ModuloDisenoOdoo.ir_cron_enviar_correos_disenos', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+        return queue
+
     def _notificar_a_validadores(self):
         validadores = self.env.ref('ModuloDisenoOdoo.group_validador').users
         template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_pendiente_validar')
         for validador in validadores:
-            template.send_mail(self.id, force_send=True, email_values={'email_to': validador.email})
+            self._enviar_plantilla(template, email_values={'email_to': validador.email})
 
     def _notificar_a_disenador(self):
         # Cambiado de 'email_template_diseño_validado' a 'email_template_diseno_validado' (sin la ñ)
         template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_validado')
-        template.send_mail(self.id, force_send=True, email_values={'email_to': self.create_uid.email})
+        self._enviar_plantilla(template, email_values={'email_to': self.create_uid.email})
 
     def action_rechazar_diseno(self):
         """Abre un wizard para que el validador ingrese los motivos del rechazo."""
         self.ensure_one()
         
         # Verificar permisos
-        if not self.env.user.has_group('ModuloDisenoOdoo.group_validador') and not self.env.user.has_group('base.group_system'):
+        roles = self.env.user._get_design_roles()
+        if not (roles.validator or roles.admin):
             raise AccessError(_("Solo los validadores pueden rechazar diseños."))
             
         # Verificar que el diseño esté en un estado que permita el rechazo
@@ -286,24 +667,27 @@ class Design(models.Model):
             }
         }
         
+    @perfilar('design.marcar_como_rechazado')
     def marcar_como_rechazado(self, motivo):
         """Marca el diseño como rechazado, limpia los campos y notifica."""
         self.ensure_one()
 
         # 1. Registrar en el historial antes de cambiar el estado
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.id,
             'tipo': 'rechazo',
             'observaciones': f'Diseño rechazado. Estado anterior: {self.state}. Motivo: {motivo}',
             'usuario_id': self.env.user.id,
         })
 
-        # 2. Eliminar todos los adjuntos (ir.attachment)
+        # 2. Pasar los adjuntos (ir.attachment) al almacenamiento frío y eliminarlos
         attachments = self.env['ir.attachment'].search([
             ('res_model', '=', 'design.design'),
             ('res_id', '=', self.id)
         ])
         if attachments:
+            self.env['design.image.version']._archivar_adjuntos(
+                [(self, attachment.name, attachment) for attachment in attachments], 'rechazo')
             attachments.unlink()
 
         # 3. Resetear los checklist items
@@ -335,7 +719,7 @@ class Design(models.Model):
         # 5. Enviar notificación por correo al diseñador
         template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_rechazado', raise_if_not_found=False)
         if template:
-            template.send_mail(self.id, force_send=True)
+            self._enviar_plantilla(template)
             
             # Notificar al diseñador
             self.message_post(
@@ -351,70 +735,64 @@ class Design(models.Model):
             # Enviar notificación por correo
             template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_rechazado', False)
             if template:
-                template.with_context(
+                self._enviar_plantilla(template.with_context(
                     lang=self.env.user.lang,
                     user_name=self.env.user.name,
                     motivo_rechazo=motivo
-                ).send_mail(self.id, force_send=True, email_values={
+                ), email_values={
                     'email_to': self.create_uid.email if self.create_uid else False
                 })
         return True
 
 
-    @api.model
-    def create(self, vals):
-        # Asignar cliente desde la tarea si existe
-        if 'task_id' in vals and vals.get('task_id'):
-            task = self.env['project.task'].browse(vals['task_id'])
-            if task.exists() and task.partner_id:
-                if not vals.get('cliente_id'):
-                    vals['cliente_id'] = task.partner_id.id
-
-            
-        # Crear el registro
-        new_design = super(Design, self).create(vals)
+    @api.model_create_multi
+    @perfilar('design.create')
+    def create(self, vals_list):
+        # Asignar cliente desde la tarea si existe (una sola lectura para todas las tareas)
+        task_ids = {vals['task_id'] for vals in vals_list if vals.get('task_id')}
+        if task_ids:
+            tasks = self.env['project.task'].browse(task_ids).exists()
+            task_partner = {task.id: task.partner_id.id for task in tasks if task.partner_id}
+            for vals in vals_list:
+                if vals.get('task_id') and not vals.get('cliente_id') and vals['task_id'] in task_partner:
+                    vals['cliente_id'] = task_partner[vals['task_id']]
+
+        # Crear los registros
+        new_designs = super(Design, self).create(vals_list)
+        new_designs._marcar_busqueda_texto()
+
+        # Añadir a los clientes como seguidores para el acceso al portal (una llamada por cliente)
+        designs_by_cliente = {}
+        for design in new_designs.filtered('cliente_id'):
+            designs_by_cliente.setdefault(design.cliente_id.id, self.browse())
+            designs_by_cliente[design.cliente_id.id] |= design
+        for cliente_id, designs in designs_by_cliente.items():
+            designs.message_subscribe(partner_ids=[cliente_id])
 
-        # Añadir al cliente como seguidor para el acceso al portal
-        if new_design.cliente_id:
-            new_design.message_subscribe(partner_ids=new_design.cliente_id.ids)
-        
         # Registrar en el historial
-        self.env['design.revision_log'].create({
-            'design_id': new_design.id,
+        self.env['design.revision_log']._registrar([{
+            'design_id': design.id,
             'usuario_id': self.env.uid,
             'tipo': 'creacion',
             'observaciones': 'Diseño creado y listo para comenzar.'
-        })
-        
-        # Enviar notificación al diseñador si corresponde
-        if new_design.create_uid and new_design.create_uid.email:
-            template = self.env.ref('modulo_diseno.email_template_diseno_creado', raise_if_not_found=False)
-            if template:
-                template.with_context(
-                    lang=new_design.create_uid.lang,
-                    user_name=new_design.create_uid.name,
-                ).send_mail(new_design.id, force_send=True, email_values={
-                    'email_to': new_design.create_uid.email
-                })
-        
-        categoria_id = vals.get('categoria_id')
-        if not categoria_id:
-            return new_design
-
-        plantilla = self.env['design.checklist_template'].search([
-            ('categoria_id', '=', categoria_id),
-            ('etapa', '=', 'etapa1')
-        ], limit=1)
-
-        if plantilla:
-            for item in plantilla.item_ids.sorted(key=lambda x: x.orden):
-                self.env['design.checklist_item'].create({
-                    'name': item.name,
-                    'design_id': new_design.id,
-                    'comentario': item.comentario_default or '',
-                })
+        } for design in new_designs])
 
-        return new_design
+        # Encolar la notificación al diseñador si corresponde
+        template = self.env.ref('modulo_diseno.email_template_diseno_creado', raise_if_not_found=False)
+        if template:
+            for new_design in new_designs:
+                if new_design.create_uid and new_design.create_uid.email:
+                    new_design._enviar_plantilla(template.with_context(
+                        lang=new_design.create_uid.lang,
+                        user_name=new_design.create_uid.name,
+                    ), email_values={
+                        'email_to': new_design.create_uid.email
+                    })
+
+        # Instanciar el checklist de etapa 1 desde la caché de plantillas, en una sola inserción
+        self.env['design.checklist_template']._instanciar_checklist(new_designs.filtered('categoria_id'), 'etapa1')
+
+        return new_designs
 
     @api.depends('state', 'diseño_subido')
     def _compute_can_reject(self):
@@ -426,10 +804,9 @@ class Design(models.Model):
     def _check_checklist_completo(self):
         """Verifica si el checklist está completo."""
         self.ensure_one()
-        if not self.checklist_ids:
-            return False
         # Verificar que todos los ítems estén validados por el diseñador
-        return all(item.validado_por_disenador for item in self.checklist_ids)
+        total, disenador, _validador = self._contadores_checklist()
+        return bool(total) and disenador == total
 
     def _enviar_notificacion_checklist_completo(self):
         """
@@ -439,7 +816,7 @@ class Design(models.Model):
         for record in self:
             if record._check_checklist_completo():
                 # Registrar primero en el historial que el diseñador completó su checklist
-                self.env['design.revision_log'].create({
+                self.env['design.revision_log']._registrar({
                     'design_id': record.id,
                     'usuario_id': self.env.user.id,
                     'tipo': 'validacion_disenador',
@@ -449,19 +826,20 @@ class Design(models.Model):
                 # Enviar notificación al validador
                 template = self.env.ref('ModuloDisenoOdoo.modulolistasdeverificacion_email_template_checklist_completado', raise_if_not_found=False)
                 if template:
-                    template.with_context(
+                    record._enviar_plantilla(template.with_context(
                         lang=self.env.user.lang,
                         user_name=self.env.user.name,
-                    ).send_mail(record.id, force_send=True, email_values=None)
+                    ))
                     
                     # Registrar que se envió la notificación al validador
-                    self.env['design.revision_log'].create({
+                    self.env['design.revision_log']._registrar({
                         'design_id': record.id,
                         'usuario_id': self.env.user.id,
                         'tipo': 'validacion_disenador',
                         'observaciones': 'Notificación enviada al validador para revisar el checklist completado.'
                     })
 
+    @perfilar('design.write')
     def write(self, vals):
         # Verificar si se están modificando campos protegidos después de subir el diseño
         if any(record.diseño_subido for record in self):
@@ -469,8 +847,9 @@ class Design(models.Model):
             protected_fields = set(vals.keys()) - set(self._fields_editables_after_upload)
             if protected_fields:
                 # Verificar si el usuario es administrador o validador
-                is_validador = self.env.user.has_group('ModuloDisenoOdoo.group_validador')
-                is_admin = self.env.user.has_group('base.group_system')
+                roles = self.env.user._get_design_roles()
+                is_validador = roles.validator
+                is_admin = roles.admin
                 
                 if not (is_validador or is_admin):
                     raise UserError(_("No puede modificar los datos del diseño después de haber sido subido. "
@@ -482,14 +861,24 @@ class Design(models.Model):
             checklist_actualizado = True
         
         # Registrar cambios en el historial si es necesario
+        transiciones = []
+        # Registros que realmente cambian de estado y valores que solo se escriben en ellos
+        cambiados = self.browse()
+        vals_cambio = {}
         if 'state' in vals:
-            
-            for record in self:
-                # Registrar fecha cuando pasa a estado cliente
-                if vals["state"] == 'cliente' and record.state != 'cliente':
-                    vals['fecha_estado_cliente'] = fields.Datetime.now()
-                    
-                self.env['design.revision_log'].create({
+            ahora = fields.Datetime.now()
+            Transition = self.env['design.state.transition']
+            cambiados = self.filtered(lambda record: record.state != vals['state'])
+            transiciones = [Transition._valores(record, vals['state'], ahora) for record in cambiados]
+            vals_cambio['fecha_cambio_estado'] = ahora
+            # Registrar fecha cuando pasa a estado cliente
+            if vals['state'] == 'cliente':
+                vals_cambio['fecha_estado_cliente'] = ahora
+
+            for record in cambiados:
+                metrics.incrementar_al_confirmar(self.env, 'design_state_transitions_total',
+                                                 **{'from': record.state, 'to': vals['state']})
+                self.env['design.revision_log']._registrar({
                     'design_id': record.id,
                     'tipo': 'cambio_estado',
                     'observaciones': f'Estado cambiado de {record.state} a {vals["state"]}'
@@ -499,20 +888,29 @@ class Design(models.Model):
         if 'comentario_validador' in vals or 'comentario_disenador' in vals:
             for record in self:
                 if 'comentario_validador' in vals and record.comentario_validador != vals['comentario_validador']:
-                    self.env['design.revision_log'].create({
+                    self.env['design.revision_log']._registrar({
                         'design_id': record.id,
                         'tipo': 'comentario',
                         'observaciones': f'Comentario del validador actualizado: {vals["comentario_validador"]}'
                     })
                 if 'comentario_disenador' in vals and record.comentario_disenador != vals['comentario_disenador']:
-                    self.env['design.revision_log'].create({
+                    self.env['design.revision_log']._registrar({
                         'design_id': record.id,
                         'tipo': 'comentario',
                         'observaciones': f'Comentario del diseñador actualizado: {vals["comentario_disenador"]}'
                     })
         
         # Guardar cambios
-        result = super(Design, self).write(vals)
+        if cambiados:
+            result = super(Design, cambiados).write(dict(vals, **vals_cambio))
+            if self - cambiados:
+                super(Design, self - cambiados).write(vals)
+        else:
+            result = super(Design, self).write(vals)
+        if transiciones:
+            self.env['design.state.transition'].sudo().create(transiciones)
+        if any(field in vals for field in self._search_trigger_fields):
+            self._marcar_busqueda_texto()
 
         # Asegurar transición a Etapa 2 cuando el estado llega a 'aprobado'
         # Esto cubre casos donde el estado se cambió por otros flujos o personalizaciones
@@ -533,10 +931,17 @@ class Design(models.Model):
         
         return result
 
+    def message_post(self, **kwargs):
+        message = super().message_post(**kwargs)
+        # Los comentarios del chatter forman parte de la búsqueda de texto
+        if message.message_type == 'comment':
+            self._marcar_busqueda_texto()
+        return message
+
     def action_forzar_etapa2(self):
         """Forzar transición a Etapa 2 para registros ya aprobados que siguen en Etapa 1."""
         self.ensure_one()
-        if not self.env.user.has_group('base.group_system'):
+        if not self.env.user._get_design_roles().admin:
             raise AccessError(_("Solo los administradores pueden forzar la transición de etapa."))
         if self.state != 'aprobado':
             raise UserError(_("Solo se puede forzar la transición cuando el estado es 'Aprobado'."))
@@ -584,7 +989,7 @@ class Design(models.Model):
         # Si es la primera vez que se sube el diseño
         elif self.state == 'borrador':
             self.state = 'validacion'
-            self.env['design.revision_log'].create({
+            self.env['design.revision_log']._registrar({
                 'design_id': self.id,
                 'tipo': 'subida',
                 'observaciones': 'Primera versión del diseño subida.'
@@ -592,7 +997,7 @@ class Design(models.Model):
         
         # Si se está reemplazando un diseño existente
         else:
-            self.env['design.revision_log'].create({
+            self.env['design.revision_log']._registrar({
                 'design_id': self.id,
                 'tipo': 'actualizacion',
                 'observaciones': 'Diseño actualizado.'
@@ -638,7 +1043,8 @@ class Design(models.Model):
         self.ensure_one()
         
         # Verificar permisos
-        if not self.env.user.has_group('ModuloDisenoOdoo.group_disenador') and not self.env.user.has_group('base.group_system'):
+        roles = self.env.user._get_design_roles()
+        if not (roles.designer or roles.admin):
             raise AccessError(_("Solo los diseñadores pueden solicitar una nueva verificación."))
             
         if self.state != 'rechazado':
@@ -688,19 +1094,19 @@ class Design(models.Model):
         """Notificar aprobación del cliente"""
         template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_aprobado_cliente', raise_if_not_found=False)
         if template:
-            template.send_mail(self.id, force_send=True)
+            self._enviar_plantilla(template)
     
     def notificar_rechazo_cliente(self):
         """Notificar rechazo del cliente"""
         template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_rechazado_cliente', raise_if_not_found=False)
         if template:
-            template.send_mail(self.id, force_send=True)
+            self._enviar_plantilla(template)
     
     def notificar_correcciones_solicitadas(self):
         """Notificar que se solicitan correcciones"""
         template = self.env.ref('ModuloDisenoOdoo.email_template_correcciones_solicitadas', raise_if_not_found=False)
         if template:
-            template.send_mail(self.id, force_send=True)
+            self._enviar_plantilla(template)
     def marcar_como_aprobado_por_cliente(self):
         """Marca el diseño como aprobado por el cliente"""
         self.ensure_one()
@@ -716,7 +1122,7 @@ class Design(models.Model):
         })
         
         # Registrar en el historial
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.id,
             'usuario_id': self.env.user.id,
             'tipo': 'aprobacion_cliente',
@@ -726,6 +1132,7 @@ class Design(models.Model):
         return True
         
         
+    @perfilar('design.action_solicitar_correcciones')
     def action_solicitar_correcciones(self, mensaje_cliente):
         """Acción cuando el cliente aprueba con correcciones"""
         self.ensure_one()
@@ -735,8 +1142,9 @@ class Design(models.Model):
         self.ultimo_mensaje_cliente = mensaje_cliente
         self.state = 'correcciones_solicitadas'
 
-        # Eliminar archivos adjuntos existentes
+        # Pasar los archivos adjuntos al almacenamiento frío (restaurables desde "Versiones anteriores")
         if self.attachment_ids:
+            self.env['design.image.version']._archivar_imagenes(self.attachment_ids, 'correcciones')
             self.attachment_ids.unlink()
 
         # Reiniciar listas de verificación del validador y diseñador
@@ -751,7 +1159,7 @@ class Design(models.Model):
         self.comentario_disenador = False
 
         # Registrar en historial
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.id,
             'usuario_id': self.env.user.id,
             'tipo': 'correcciones_cliente',
@@ -772,7 +1180,7 @@ class Design(models.Model):
         self.fecha_rechazo = fields.Datetime.now()
 
         # Registrar en historial
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.id,
             'usuario_id': self.env.user.id,
             'tipo': 'rechazo_cliente',
@@ -782,12 +1190,159 @@ class Design(models.Model):
         # Notificar al diseñador/validador
         self.notificar_rechazo_cliente()
 
+    def _transicion_a_etapa2_lote(self):
+        """Versión por lotes de _transicion_a_etapa2_aprobado: un unlink y una inserción
+        de ítems para todos los diseños, y un mensaje de chatter por diseño en un solo lote."""
+        ChecklistTemplate = self.env['design.checklist_template']
+        con_plantilla = self.filtered(
+            lambda d: ChecklistTemplate._get_compiled_items(d.categoria_id.id, 'etapa2') is not None)
+
+        con_plantilla.checklist_ids.filtered(lambda x: x.etapa == 'etapa1').unlink()
+        ChecklistTemplate._instanciar_checklist(con_plantilla, 'etapa2')
+
+        self._message_log_batch({
+            record.id: ("Diseño aprobado. Se ha cargado el checklist de Etapa 2." if record in con_plantilla
+                        else "Diseño aprobado. Se mantiene el checklist de Etapa 1 (no hay plantilla para Etapa 2).")
+            for record in self
+        })
+        _logger.info(f"Transición a etapa 2 en lote: {len(self)} diseños, {len(con_plantilla)} con plantilla de etapa 2")
+
+    @perfilar('design.confirmar_en_lote')
+    def confirmar_en_lote(self):
+        """Confirma (aprueba) varios diseños con una sola escritura, un lote de historial
+        y las notificaciones en la cola de correo."""
+        roles = self.env.user._get_design_roles()
+        if not (roles.validator or roles.admin):
+            raise AccessError(_("Solo los validadores pueden confirmar diseños."))
+
+        invalidos = self.filtered(lambda d: d.state not in ['cliente', 'validacion', 'correcciones_solicitadas'])
+        if invalidos:
+            raise UserError(_("No se pueden confirmar diseños en su estado actual: %s", ', '.join(invalidos.mapped('name'))))
+
+        # Transición a etapa 2 solo para los que aún no están en ella
+        self.filtered(lambda d: d.etapa != 'etapa2')._transicion_a_etapa2_lote()
+
+        # Una sola escritura; la etapa ya queda en 'etapa2' para que write no repita la transición
+        self.write({
+            'state': 'aprobado',
+            'etapa': 'etapa2',
+            'fecha_aprobacion_cliente': fields.Datetime.now(),
+            'aprobado_cliente': True,
+            'rechazado': False
+        })
+
+        self.env['design.revision_log']._registrar([{
+            'design_id': record.id,
+            'usuario_id': self.env.user.id,
+            'tipo': 'validacion_validador',
+            'observaciones': 'Diseño confirmado por validador en una transición masiva. Transición a Etapa 2 realizada.'
+        } for record in self])
+
+        template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_aprobado_cliente', raise_if_not_found=False)
+        if template:
+            for record in self:
+                record._enviar_plantilla(template)
+        return True
+
+    @perfilar('design.rechazar_en_lote')
+    def rechazar_en_lote(self, motivo):
+        """Rechaza varios diseños: limpia adjuntos, checklist y campos con escrituras
+        únicas, registra el historial en un lote y encola las notificaciones."""
+        roles = self.env.user._get_design_roles()
+        if not (roles.validator or roles.admin):
+            raise AccessError(_("Solo los validadores pueden rechazar diseños."))
+
+        invalidos = self.filtered(lambda d: d.state not in ['validacion', 'cliente'])
+        if invalidos:
+            raise UserError(_("No se pueden rechazar diseños en su estado actual: %s", ', '.join(invalidos.mapped('name'))))
+
+        # 1. Registrar en el historial antes de cambiar el estado
+        self.env['design.revision_log']._registrar([{
+            'design_id': record.id,
+            'tipo': 'rechazo',
+            'observaciones': f'Diseño rechazado. Estado anterior: {record.state}. Motivo: {motivo}',
+            'usuario_id': self.env.user.id,
+        } for record in self])
+
+        # 2. Pasar los adjuntos (ir.attachment) al almacenamiento frío y eliminarlos en una sola operación
+        attachments = self.env['ir.attachment'].search([
+            ('res_model', '=', 'design.design'),
+            ('res_id', 'in', self.ids)
+        ])
+        if attachments:
+            self.env['design.image.version']._archivar_adjuntos(
+                [(self.browse(attachment.res_id), attachment.name, attachment) for attachment in attachments],
+                'rechazo')
+            attachments.unlink()
+
+        # 3. Resetear los checklist items de todos los diseños
+        if self.checklist_ids:
+            self.checklist_ids.write({
+                'validado_por_disenador': False,
+                'validado_por_validador': False,
+                'fecha_disenador': None,
+                'fecha_validador': None,
+            })
+
+        # 4. Limpiar campos con una sola escritura
+        self.write({
+            'etapa': 'etapa1',
+            'state': 'rechazado',
+            'rechazado': True,
+            'observaciones_rechazo': motivo,
+            'fecha_rechazo': fields.Datetime.now(),
+            'comentario_validador': '',
+            'comentario_disenador': '',
+            'ultimo_mensaje_cliente': '',
+            'aprobado_cliente': False,
+            'fecha_aprobacion_cliente': None,
+            'diseño_subido': False,
+            'fecha_subida_diseno': None,
+        })
+
+        # 5. Notificar al diseñador: una nota de chatter por diseño en un solo lote
+        #    (sin notificaciones por mensaje) y el correo de la plantilla en cola
+        self._message_log_batch({
+            record.id: Markup(_(
+                "<p><strong>Diseño Rechazado - Se requiere nueva versión</strong></p>"
+                "<p>El diseño ha sido rechazado por el validador.</p>"
+                "<p><strong>Motivo del rechazo:</strong> %s</p>"
+                "<p>Por favor, suba un nuevo diseño con las correcciones solicitadas.</p>"
+            )) % motivo
+            for record in self
+        })
+        template = self.env.ref('ModuloDisenoOdoo.email_template_diseno_rechazado', raise_if_not_found=False)
+        if template:
+            template = template.with_context(
+                lang=self.env.user.lang,
+                user_name=self.env.user.name,
+                motivo_rechazo=motivo
+            )
+            for record in self:
+                record._enviar_plantilla(template, email_values={
+                    'email_to': record.create_uid.email if record.create_uid else False
+                })
+        return True
+
+    def action_transicion_masiva(self):
+        """Abre el asistente de transición masiva para los diseños seleccionados"""
+        return {
+            'name': _('Transición masiva'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'design.transicion.masiva.wizard',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'default_design_ids': self.ids},
+        }
+
+    @perfilar('design.action_confirmar_diseno')
     def action_confirmar_diseno(self):
         """Acción para que un validador interno confirme el diseño manualmente"""
         self.ensure_one()
         
         # Verificar permisos - solo validadores pueden confirmar diseños
-        if not self.env.user.has_group('ModuloDisenoOdoo.group_validador') and not self.env.user.has_group('base.group_system'):
+        roles = self.env.user._get_design_roles()
+        if not (roles.validator or roles.admin):
             raise AccessError(_("Solo los validadores pueden confirmar diseños."))
             
         # Verificar que el diseño esté en un estado que permita la confirmación
@@ -807,7 +1362,7 @@ class Design(models.Model):
         })
         
         # Registrar en el historial
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.id,
             'usuario_id': self.env.user.id,
             'tipo': 'validacion_validador',
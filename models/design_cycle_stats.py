@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+class DesignCycleStats(models.Model):
+    """Agregado semanal de tiempos de ciclo por categoría, diseñador y estado.
+
+    Se materializa a partir de design.state.transition: cada fila suma las horas
+    que los diseños pasaron en `estado` y salieron de él durante la semana. El
+    cron recalcula completas las semanas con cambios creados desde la última
+    pasada (con un margen de solapamiento), así que repetir una semana no cambia
+    el resultado."""
+    _name = 'design.cycle.stats'
+    _description = 'Estadísticas semanales de ciclo de diseños'
+    _order = 'semana desc, categoria_id, disenador_id, estado'
+
+    semana = fields.Date('Semana', required=True, index=True, readonly=True)
+    categoria_id = fields.Many2one('product.category', string='Categoría', readonly=True, ondelete='cascade')
+    disenador_id = fields.Many2one('res.users', string='Diseñador', readonly=True, ondelete='cascade')
+    estado = fields.Selection(
+        selection=lambda self: self.env['design.design']._fields['state'].selection,
+        string='Estado', readonly=True)
+    salidas = fields.Integer('Salidas del estado', readonly=True)
+    horas_total = fields.Float('Horas en el estado', readonly=True)
+    horas_promedio = fields.Float('Horas promedio', readonly=True, group_operator='avg')
+    rechazos = fields.Integer('Rechazos', readonly=True)
+    modificaciones = fields.Integer('Correcciones solicitadas', readonly=True)
+    modificaciones_max = fields.Integer('Máx. contador de modificaciones', readonly=True, group_operator='max')
+
+    _sql_constraints = [
+        ('semana_dimensiones_uniq', 'unique(semana, categoria_id, disenador_id, estado)',
+         'Ya existe una fila de estadísticas para esta semana y dimensiones.'),
+    ]
+
+    _last_run_param = 'ModuloDisenoOdoo.cycle_stats_last_run'
+    # Margen para incluir cambios de transacciones que empezaron antes de la
+    # última pasada pero confirmaron después
+    _solapamiento = timedelta(hours=1)
+
+    @api.model
+    def _cron_refrescar(self):
+        """Recalcula las semanas que recibieron cambios de estado desde la última ejecución"""
+        Param = self.env['ir.config_parameter'].sudo()
+        cr = self.env.cr
+        self.env['design.state.transition'].flush_model()
+        ahora = fields.Datetime.now()
+        ultima = fields.Datetime.to_datetime(Param.get_param(self._last_run_param))
+
+        cr.execute("""
+            SELECT DISTINCT date_trunc('week', fecha)::date
+              FROM design_state_transition
+             WHERE %s IS NULL OR create_date >= %s
+        """, (ultima, ultima and ultima - self._solapamiento))
+        semanas = [row[0] for row in cr.fetchall()]
+        if not semanas:
+            Param.set_param(self._last_run_param, fields.Datetime.to_string(ahora))
+            return
+
+        cr.execute("DELETE FROM design_cycle_stats WHERE semana = ANY(%s)", (semanas,))
+        cr.execute("""
+            INSERT INTO design_cycle_stats
+                   (semana, categoria_id, disenador_id, estado, salidas, horas_total, horas_promedio,
+                    rechazos, modificaciones, modificaciones_max,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT date_trunc('week', t.fecha)::date, t.categoria_id, t.disenador_id, t.estado_desde,
+                   COUNT(*), COALESCE(SUM(t.horas_en_estado), 0), COALESCE(AVG(t.horas_en_estado), 0),
+                   COUNT(*) FILTER (WHERE t.estado_hasta = 'rechazado'),
+                   COUNT(*) FILTER (WHERE t.estado_hasta = 'correcciones_solicitadas'),
+                   COALESCE(MAX(t.contador_modificaciones), 0),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM design_state_transition t
+             WHERE date_trunc('week', t.fecha)::date = ANY(%(semanas)s)
+          GROUP BY 1, 2, 3, 4
+        """, {'uid': self.env.uid, 'semanas': semanas})
+        _logger.info(f"Estadísticas de ciclo recalculadas para {len(semanas)} semanas ({cr.rowcount} filas)")
+
+        Param.set_param(self._last_run_param, fields.Datetime.to_string(ahora))
+        self.invalidate_model()
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+import logging
+
 from odoo import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
 class DesignAttachment(models.Model):
     _inherit = ['portal.mixin']
     _name = 'design.image'  # Se mantiene este nombre por compatibilidad con versiones anteriores
@@ -17,41 +21,91 @@ class DesignAttachment(models.Model):
                 vals['access_token'] = record.access_token
         return super().create(vals_list)
 
+    def unlink(self):
+        blobs = self.blob_id
+        res = super().unlink()
+        blobs._gc_huerfanos()
+        return res
+
     name = fields.Char('Nombre del Archivo', required=True, help='Nombre del archivo adjunto')
-    file_data = fields.Binary('Archivo', required=True, attachment=True, help='Contenido del archivo')
-    mimetype = fields.Char('Tipo MIME', compute='_compute_mimetype', store=True, help='Tipo MIME del archivo')
-    file_size = fields.Integer('Tamaño (bytes)', compute='_compute_file_size', store=True, help='Tamaño del archivo en bytes')
+
+    # El contenido se guarda deduplicado en design.image.blob (clave: SHA1 de los bytes)
+    blob_id = fields.Many2one('design.image.blob', string='Contenido', ondelete='restrict', index=True, readonly=True)
+    file_data = fields.Binary('Archivo', required=True, compute='_compute_file_data', inverse='_inverse_file_data',
+                              help='Contenido del archivo')
+    mimetype = fields.Char('Tipo MIME', related='blob_id.mimetype', store=True, help='Tipo MIME del archivo')
+    file_size = fields.Integer('Tamaño (bytes)', related='blob_id.file_size', store=True, help='Tamaño del archivo en bytes')
     design_id = fields.Many2one('design.design', string='Diseño', ondelete='cascade', required=True, help='Diseño relacionado')
     sequence = fields.Integer('Secuencia', default=10, help='Orden de visualización')
-    
+
     # Campo para previsualización usando Data
-    image_preview = fields.Image('Vista Previa', max_width=300, max_height=300, 
-                                compute='_compute_image_preview', store=True,
-                                help='Vista previa de la imagen para mostrar en las vistas')
+    image_preview = fields.Image('Vista Previa', related='blob_id.image_preview',
+                                 help='Vista previa de la imagen para mostrar en las vistas')
 
-    @api.depends('file_data')
-    def _compute_mimetype(self):
-        """Calcula el tipo MIME del archivo basado en su contenido."""
-        for record in self:
-            if record.file_data:
-                record.mimetype = self.env['ir.attachment']._compute_mimetype({'datas': record.file_data})
-            else:
-                record.mimetype = False
-
-    @api.depends('file_data')
-    def _compute_file_size(self):
-        """Calcula el tamaño del archivo en bytes."""
-        for record in self:
-            if record.file_data:
-                record.file_size = len(record.file_data)
-            else:
-                record.file_size = 0
-
-    @api.depends('file_data', 'mimetype')
-    def _compute_image_preview(self):
-        """Genera la vista previa de la imagen si es un archivo de imagen."""
+    # Huella del contenido: identifica los derivados generados a partir de file_data
+    checksum = fields.Char('Checksum', related='blob_id.checksum', store=True, index=True,
+                           help='SHA1 del contenido del archivo')
+
+    # Derivados en miniatura, calculados una sola vez por contenido en el blob
+    image_128 = fields.Image('Miniatura 128px', related='blob_id.image_128')
+    image_512 = fields.Image('Miniatura 512px', related='blob_id.image_512')
+    image_1024 = fields.Image('Miniatura 1024px', related='blob_id.image_1024')
+
+    @api.depends('blob_id')
+    def _compute_file_data(self):
         for record in self:
-            if record.file_data and record.mimetype and record.mimetype.startswith('image/'):
-                record.image_preview = record.file_data
-            else:
-                record.image_preview = False
+            record.file_data = record.blob_id.sudo().file_data
+
+    def _inverse_file_data(self):
+        """Asocia el adjunto al blob de su contenido; si ya existe no se vuelve a guardar"""
+        Blob = self.env['design.image.blob'].sudo()
+        anteriores = self.blob_id
+        con_datos = self.filtered('file_data')
+        # Todos los archivos nuevos pasan juntos por la ingesta (miniaturas en paralelo)
+        for record, blob in zip(con_datos, Blob._obtener_o_crear_lote(con_datos.mapped('file_data'))):
+            record.blob_id = blob
+        (self - con_datos).blob_id = False
+        (anteriores - self.blob_id)._gc_huerfanos()
+
+    @api.model
+    def _migrar_a_blobs(self):
+        """Mueve el contenido de los adjuntos anteriores a la deduplicación a design.image.blob"""
+        Attachment = self.env['ir.attachment'].sudo()
+        Blob = self.env['design.image.blob'].sudo()
+        legacy = Attachment.search([('res_model', '=', self._name), ('res_field', '=', 'file_data')])
+        for attachment in legacy:
+            image = self.browse(attachment.res_id).exists()
+            if image and not image.blob_id and attachment.datas:
+                image.blob_id = Blob._obtener_o_crear(attachment.datas)
+        # El archivo en disco lo conserva el blob (mismo checksum en el filestore)
+        Attachment.search([
+            ('res_model', '=', self._name),
+            ('res_field', 'in', ['file_data', 'image_preview', 'image_128', 'image_512', 'image_1024']),
+        ]).unlink()
+
+    @api.model
+    def _corregir_tamanos(self):
+        """Corrige los tamaños guardados antes de la ingesta única, que eran la
+        longitud del base64 (~33% de más), tomando el tamaño real del filestore"""
+        self.env['design.image.blob'].flush_model(['file_size'])
+        self.env.cr.execute("""
+            UPDATE design_image_blob blob
+               SET file_size = att.file_size
+              FROM ir_attachment att
+             WHERE att.res_model = 'design.image.blob'
+               AND att.res_field = 'file_data'
+               AND att.res_id = blob.id
+               AND blob.file_size IS DISTINCT FROM att.file_size
+        """)
+        corregidos = self.env.cr.rowcount
+        self.env.cr.execute("""
+            UPDATE design_image image
+               SET file_size = blob.file_size
+              FROM design_image_blob blob
+             WHERE image.blob_id = blob.id
+               AND image.file_size IS DISTINCT FROM blob.file_size
+        """)
+        if corregidos:
+            _logger.info(f"Corregido el tamaño de {corregidos} contenidos de diseño")
+        self.env['design.image.blob'].invalidate_model(['file_size'])
+        self.invalidate_model(['file_size'])
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import logging
+import os
+import shutil
+
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.tools.image import binary_to_image
+from odoo.tools.mimetypes import guess_mimetype
+
+from ..utils import ingesta
+
+_logger = logging.getLogger(__name__)
+
+class DesignImageBlob(models.Model):
+    """Contenido de un adjunto de diseño, identificado por su SHA1.
+
+    Varios design.image con los mismos bytes comparten un único blob: el archivo,
+    el tipo MIME, el tamaño y las miniaturas se guardan y calculan una sola vez."""
+    _name = 'design.image.blob'
+    _description = 'Contenido de adjunto de diseño'
+    _rec_name = 'checksum'
+
+    checksum = fields.Char('Checksum', required=True, readonly=True, index=True,
+                           help='SHA1 del contenido del archivo')
+    file_data = fields.Binary('Archivo', required=True, attachment=True)
+    # Todos los metadatos y derivados salen de una única etapa de ingesta (_ingerir)
+    mimetype = fields.Char('Tipo MIME', compute='_compute_ingesta', store=True)
+    file_size = fields.Integer('Tamaño (bytes)', compute='_compute_ingesta', store=True)
+    image_width = fields.Integer('Ancho (px)', compute='_compute_ingesta', store=True)
+    image_height = fields.Integer('Alto (px)', compute='_compute_ingesta', store=True)
+    image_preview = fields.Image('Vista Previa', max_width=300, max_height=300,
+                                 compute='_compute_ingesta', store=True)
+    image_128 = fields.Image('Miniatura 128px', max_width=128, max_height=128,
+                             compute='_compute_ingesta', store=True)
+    image_512 = fields.Image('Miniatura 512px', max_width=512, max_height=512,
+                             compute='_compute_ingesta', store=True)
+    image_1024 = fields.Image('Miniatura 1024px', max_width=1024, max_height=1024,
+                              compute='_compute_ingesta', store=True)
+    # Copias WebP de las miniaturas del portal, para navegadores que las aceptan
+    # (Binary y no Image: fields.Image las volvería a codificar como JPEG)
+    webp = fields.Boolean('Miniaturas WebP', compute='_compute_ingesta', store=True)
+    image_512_webp = fields.Binary('Miniatura 512px (WebP)', attachment=True,
+                                   compute='_compute_ingesta', store=True)
+    image_1024_webp = fields.Binary('Miniatura 1024px (WebP)', attachment=True,
+                                    compute='_compute_ingesta', store=True)
+
+    image_ids = fields.One2many('design.image', 'blob_id', string='Adjuntos que lo usan')
+    ref_count = fields.Integer('Referencias', compute='_compute_ref_count', store=True, index=True)
+
+    # Tamaños de las miniaturas (campo image_<tamaño>); la vista previa usa _preview_size
+    _image_variant_sizes = (128, 512, 1024)
+    _preview_size = 300
+    # Miniaturas con copia WebP (campo image_<tamaño>_webp)
+    _webp_sizes = (512, 1024)
+
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(checksum)', 'Ya existe un contenido con el mismo checksum.'),
+    ]
+
+    @api.model
+    def _valores_vacios(self):
+        vals = {'mimetype': False, 'file_size': 0, 'image_width': 0, 'image_height': 0, 'image_preview': False}
+        vals.update({f'image_{size}': False for size in self._image_variant_sizes})
+        vals['webp'] = False
+        vals.update({f'image_{size}_webp': False for size in self._webp_sizes})
+        return vals
+
+    @api.model
+    def _ingerir(self, sources):
+        """Etapa única de ingesta: a partir de los bytes ya decodificados calcula el
+        tipo MIME (por contenido), el tamaño real, las dimensiones, la vista previa
+        y las miniaturas. Devuelve una lista de valores, uno por fuente.
+
+        El redimensionado de todas las imágenes se reparte en el pool de procesos."""
+        vals_list = []
+        tareas = []
+        for raw in sources:
+            mimetype = guess_mimetype(raw, default='application/octet-stream')
+            vals = dict(self._valores_vacios(), mimetype=mimetype, file_size=len(raw))
+
+            if mimetype.startswith('image/'):
+                # Las imágenes sin transparencia se recodifican como JPEG; las que tienen
+                # canal alfa conservan su formato para no perder el fondo transparente
+                output_format = ''
+                if mimetype != 'image/svg+xml':
+                    image = binary_to_image(raw)
+                    vals['image_width'], vals['image_height'] = image.size
+                    if image.mode not in ('RGBA', 'LA', 'P'):
+                        output_format = 'JPEG'
+                # La miniatura mayor va primero: el resto se deriva de ella
+                variantes = [(f'image_{size}', {
+                    'size': (size, size),
+                    'quality': 80 if output_format else 0,
+                    'output_format': output_format,
+                }) for size in sorted(self._image_variant_sizes, reverse=True)]
+                variantes.append(('image_preview', {'size': (self._preview_size, self._preview_size)}))
+                tareas.append((len(vals_list), raw, variantes))
+            vals_list.append(vals)
+
+        resultados = ingesta.procesar_imagenes(
+            self.env, [(raw, [kwargs for _f, kwargs in variantes]) for _i, raw, variantes in tareas])
+        webp = ingesta.webp_disponible()
+        for (index, _raw, variantes), imagenes in zip(tareas, resultados):
+            vals = vals_list[index]
+            por_campo = {fname: resultado for (fname, _kwargs), resultado in zip(variantes, imagenes)}
+            for fname, resultado in por_campo.items():
+                vals[fname] = base64.b64encode(resultado)
+            if webp and vals['mimetype'] != 'image/svg+xml':
+                for size in self._webp_sizes:
+                    vals[f'image_{size}_webp'] = base64.b64encode(ingesta.a_webp(por_campo[f'image_{size}']))
+                vals['webp'] = True
+        return vals_list
+
+    @api.depends('file_data')
+    def _compute_ingesta(self):
+        """Recalcula metadatos y derivados (el contenido se decodifica una sola vez)"""
+        con_datos = self.filtered('file_data')
+        vals_list = self._ingerir([base64.b64decode(record.file_data) for record in con_datos])
+        for record, vals in zip(con_datos, vals_list):
+            record.update(vals)
+        (self - con_datos).update(self._valores_vacios())
+
+    @api.model
+    def _obtener_o_crear(self, file_data):
+        """Devuelve el blob del contenido (base64), creándolo solo si no existe"""
+        return self._obtener_o_crear_lote([file_data])[0]
+
+    @api.model
+    def _obtener_o_crear_lote(self, file_datas):
+        """Devuelve un blob por cada contenido (base64) recibido.
+
+        Cada contenido se decodifica una única vez; los ya almacenados se
+        reutilizan y los nuevos pasan juntos por la ingesta, de modo que las
+        miniaturas de todos se generan en paralelo."""
+        raws = [base64.b64decode(file_data) for file_data in file_datas]
+        checksums = [hashlib.sha1(raw).hexdigest() for raw in raws]
+        existentes = {blob.checksum: blob for blob in self.search([('checksum', 'in', list(set(checksums)))])}
+        for checksum in set(checksums) & set(existentes):
+            _logger.info(f"Contenido {checksum} ya almacenado: se reutiliza el blob {existentes[checksum].id}")
+
+        nuevos = {}
+        for raw, checksum in zip(raws, checksums):
+            if checksum not in existentes and checksum not in nuevos:
+                nuevos[checksum] = raw
+        if nuevos:
+            vals_list = self._ingerir(list(nuevos.values()))
+            for vals, checksum in zip(vals_list, nuevos):
+                vals['checksum'] = checksum
+            for (blob, creado), raw in zip(self._crear_lote(vals_list), nuevos.values()):
+                if creado:
+                    blob._guardar_contenido(raw=raw)
+                existentes[blob.checksum] = blob
+        return [existentes[checksum] for checksum in checksums]
+
+    @api.model
+    def _crear_lote(self, vals_list):
+        """Crea los blobs y devuelve una lista de (blob, creado).
+
+        Si otra transacción guardó el mismo contenido entre la búsqueda y la
+        inserción (checksum_uniq), se reintenta uno a uno y se reutiliza el blob
+        existente. Si todavía no es visible para esta transacción, el error se
+        propaga."""
+        try:
+            with self.env.cr.savepoint():
+                return [(blob, True) for blob in self.create(vals_list)]
+        except psycopg2.IntegrityError:
+            pass
+        resultado = []
+        for vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    resultado.append((self.create(vals), True))
+            except psycopg2.IntegrityError:
+                blob = self.search([('checksum', '=', vals['checksum'])], limit=1)
+                if not blob:
+                    raise
+                _logger.info(f"Contenido {vals['checksum']} creado en paralelo: se reutiliza el blob {blob.id}")
+                resultado.append((blob, False))
+        return resultado
+
+    @api.model
+    def _obtener_o_crear_desde_archivo(self, path, mimetype):
+        """Igual que _obtener_o_crear pero a partir de un archivo temporal en disco.
+
+        El archivo se recorre por bloques para el checksum y se mueve tal cual al
+        filestore, sin cargarlo nunca entero (ni en base64) en memoria; solo las
+        imágenes se leen para generar sus miniaturas. El archivo temporal deja de
+        existir al terminar."""
+        sha = hashlib.sha1()
+        file_size = 0
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+                file_size += len(block)
+        checksum = sha.hexdigest()
+
+        blob = self.search([('checksum', '=', checksum)], limit=1)
+        if blob:
+            _logger.info(f"Contenido {checksum} ya almacenado: se reutiliza el blob {blob.id}")
+            os.unlink(path)
+            return blob
+
+        if mimetype and mimetype.startswith('image/'):
+            with open(path, 'rb') as f:
+                vals = self._ingerir([f.read()])[0]
+        else:
+            vals = dict(self._valores_vacios(), mimetype=mimetype, file_size=file_size)
+        vals['checksum'] = checksum
+        blob, creado = self._crear_lote([vals])[0]
+        if creado:
+            blob._guardar_contenido(path=path)
+        else:
+            os.unlink(path)
+        return blob
+
+    def _guardar_contenido(self, raw=None, path=None):
+        """Crea el adjunto del campo file_data a partir de los bytes o de un archivo.
+
+        Se crea directamente (sin escribir file_data) para no volver a disparar la
+        ingesta. Un archivo en disco se mueve al filestore sin leerlo: el adjunto
+        se crea vacío y se apunta al archivo por SQL, porque ir.attachment.create
+        descarta store_fname, checksum y file_size."""
+        self.ensure_one()
+        Attachment = self.env['ir.attachment'].sudo()
+        attachment_vals = {
+            'name': 'file_data',
+            'res_model': self._name,
+            'res_field': 'file_data',
+            'res_id': self.id,
+            'type': 'binary',
+            'mimetype': self.mimetype,
+        }
+        if path and Attachment._storage() == 'file':
+            # Misma ruta que ir.attachment._get_path, que no sirve aquí: compara el
+            # contenido con bytes en memoria cuando el archivo ya existe
+            fname = f'{self.checksum[:2]}/{self.checksum}'
+            full_path = Attachment._full_path(fname)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.unlink(path)
+            else:
+                shutil.move(path, full_path)
+                # Si la transacción se revierte, el GC del filestore lo elimina
+                Attachment._mark_for_gc(fname)
+            attachment = Attachment.create(attachment_vals)
+            attachment.flush_recordset()
+            self.env.cr.execute("""
+                UPDATE ir_attachment
+                   SET store_fname = %s, checksum = %s, file_size = %s, mimetype = %s, db_datas = NULL
+                 WHERE id = %s
+            """, (fname, self.checksum, self.file_size, self.mimetype, attachment.id))
+            attachment.invalidate_recordset()
+            self.invalidate_recordset(['file_data'])
+            return attachment
+        if path:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            os.unlink(path)
+        attachment_vals['raw'] = raw
+        return Attachment.create(attachment_vals)
+
+    @api.depends('image_ids')
+    def _compute_ref_count(self):
+        data = self.env['design.image'].read_group(
+            [('blob_id', 'in', self.ids)], ['blob_id'], ['blob_id'])
+        counts = {item['blob_id'][0]: item['blob_id_count'] for item in data}
+        for blob in self:
+            blob.ref_count = counts.get(blob.id, 0)
+
+    def _gc_huerfanos(self):
+        """Elimina los blobs que ya no usa ningún adjunto"""
+        huerfanos = self.exists().filtered(lambda blob: not blob.ref_count)
+        if huerfanos:
+            _logger.info(f"Eliminando {len(huerfanos)} blobs de diseño sin referencias")
+            huerfanos.unlink()
+
+    @api.autovacuum
+    def _gc_blobs_huerfanos(self):
+        """Limpia los blobs huérfanos (p. ej. tras borrar diseños en cascada)"""
+        self.env['design.image'].flush_model(['blob_id'])
+        self.search([])._compute_ref_count()
+        self.search([('ref_count', '=', 0)])._gc_huerfanos()
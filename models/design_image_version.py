@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import gzip
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+class DesignImageVersion(models.Model):
+    """Versión anterior de un archivo de diseño guardada en almacenamiento frío.
+
+    Cuando una ronda de correcciones o un rechazo reemplaza los archivos del
+    diseño, el contenido se comprime con gzip fuera del filestore activo
+    (``<data_dir>/design_cold/<base de datos>/<sha[:2]>/<sha>.gz``) y aquí queda
+    solo la metadata. El archivo frío se comparte entre versiones con el mismo
+    checksum y se puede restaurar como adjunto sin volver a subirlo."""
+    _name = 'design.image.version'
+    _description = 'Versión archivada de adjunto de diseño'
+    _order = 'fecha_archivado desc, id desc'
+
+    design_id = fields.Many2one('design.design', string='Diseño', required=True, ondelete='cascade', index=True)
+    name = fields.Char('Nombre del Archivo', required=True)
+    mimetype = fields.Char('Tipo MIME')
+    file_size = fields.Integer('Tamaño (bytes)')
+    checksum = fields.Char('Checksum', required=True, index=True, help='SHA1 del contenido sin comprimir')
+    compressed_size = fields.Integer('Tamaño comprimido (bytes)')
+    ronda = fields.Integer('Ronda de correcciones', help='Valor de contador_modificaciones al archivar')
+    motivo = fields.Selection([
+        ('correcciones', 'Correcciones del cliente'),
+        ('rechazo', 'Rechazo'),
+    ], string='Motivo', required=True)
+    fecha_archivado = fields.Datetime('Fecha de archivado', default=fields.Datetime.now, readonly=True)
+    usuario_id = fields.Many2one('res.users', string='Archivado por', default=lambda self: self.env.user, readonly=True)
+    restored_image_id = fields.Many2one('design.image', string='Restaurado como', readonly=True, ondelete='set null')
+
+    @api.model
+    def _directorio(self):
+        base = self.env['ir.config_parameter'].sudo().get_param('ModuloDisenoOdoo.cold_storage_path') \
+            or os.path.join(config['data_dir'], 'design_cold')
+        return os.path.join(base, self.env.cr.dbname)
+
+    @api.model
+    def _ruta_fria(self, checksum):
+        return os.path.join(self._directorio(), checksum[:2], f'{checksum}.gz')
+
+    @api.model
+    def _comprimir(self, attachment):
+        """Copia comprimido el contenido de un ir.attachment al almacenamiento frío.
+
+        Se lee por bloques desde el filestore; si ya existe el archivo del
+        mismo checksum no se vuelve a escribir. Devuelve el tamaño comprimido."""
+        dest = self._ruta_fria(attachment.checksum)
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f'{dest}.{uuid.uuid4().hex}.tmp'
+            with gzip.open(tmp, 'wb') as out:
+                if attachment.store_fname:
+                    with open(attachment._full_path(attachment.store_fname), 'rb') as src:
+                        shutil.copyfileobj(src, out, 1024 * 1024)
+                else:
+                    out.write(attachment.raw)
+            os.replace(tmp, dest)
+        return os.path.getsize(dest)
+
+    @api.model
+    def _archivar_adjuntos(self, attachments, motivo):
+        """Pasa al almacenamiento frío los ir.attachment recibidos y crea sus versiones.
+
+        `attachments` es una lista de (design, nombre, ir.attachment). No borra el
+        original: eso lo hace quien llama, una vez archivado."""
+        vals_list = []
+        for design, name, attachment in attachments:
+            if not attachment.checksum:
+                continue
+            vals_list.append({
+                'design_id': design.id,
+                'name': name,
+                'mimetype': attachment.mimetype,
+                'file_size': attachment.file_size,
+                'checksum': attachment.checksum,
+                'compressed_size': self._comprimir(attachment),
+                'ronda': design.contador_modificaciones,
+                'motivo': motivo,
+            })
+        if vals_list:
+            _logger.info(f"Archivando {len(vals_list)} adjuntos de diseño en almacenamiento frío ({motivo})")
+        return self.sudo().create(vals_list)
+
+    @api.model
+    def _archivar_imagenes(self, images, motivo):
+        """Archiva los design.image (el contenido vive en el adjunto de su blob)"""
+        images = images.sudo().filtered('blob_id')
+        blob_attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'design.image.blob'),
+            ('res_field', '=', 'file_data'),
+            ('res_id', 'in', images.blob_id.ids),
+        ])
+        by_blob = {attachment.res_id: attachment for attachment in blob_attachments}
+        return self._archivar_adjuntos([
+            (image.design_id, image.name, by_blob[image.blob_id.id])
+            for image in images if image.blob_id.id in by_blob
+        ], motivo)
+
+    def action_restaurar(self):
+        """Restaura las versiones como adjuntos activos del diseño"""
+        self.design_id.check_access_rights('write')
+        self.design_id.check_access_rule('write')
+        if not self:
+            return True
+        # Bloquear las versiones: dos restauraciones simultáneas de la misma versión
+        # se serializan y la segunda ve el resultado de la primera
+        self.env.cr.execute(
+            "SELECT id FROM design_image_version WHERE id IN %s FOR UPDATE", (tuple(self.ids),))
+        self.invalidate_recordset(['restored_image_id'])
+        for version in self:
+            if version.restored_image_id:
+                raise UserError(_("La versión %s ya fue restaurada como %s.",
+                                  version.name, version.restored_image_id.display_name))
+            if not os.path.exists(version._ruta_fria(version.checksum)):
+                raise UserError(_("El archivo de la versión %s ya no está en el almacenamiento frío.",
+                                  version.name))
+
+        Blob = self.env['design.image.blob'].sudo()
+        Upload = self.env['design.upload.session']
+        images = self.env['design.image']
+        for version in self:
+            # Se descomprime a un temporal y el blob lo mueve al filestore
+            # (si el contenido sigue activo en otro adjunto, se reutiliza)
+            tmp = os.path.join(Upload._directorio(), f'{uuid.uuid4().hex}.part')
+            with gzip.open(version._ruta_fria(version.checksum), 'rb') as src, open(tmp, 'wb') as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            blob = Blob._obtener_o_crear_desde_archivo(tmp, version.mimetype)
+            image = images.create({
+                'name': version.name,
+                'blob_id': blob.id,
+                'design_id': version.design_id.id,
+            })
+            version.sudo().restored_image_id = image
+            images |= image
+        _logger.info(f"Restauradas {len(images)} versiones archivadas de diseño")
+        return True
+
+    @api.autovacuum
+    def _gc_archivos_frios(self):
+        """Elimina los archivos fríos que ya no referencia ninguna versión"""
+        directorio = self._directorio()
+        if not os.path.isdir(directorio):
+            return
+        self.env.cr.execute("SELECT DISTINCT checksum FROM design_image_version")
+        en_uso = {row[0] for row in self.env.cr.fetchall()}
+        # Margen para no borrar archivos de transacciones que aún no confirmaron
+        limite = time.time() - 3600
+        eliminados = 0
+        for prefix in os.listdir(directorio):
+            for fname in os.listdir(os.path.join(directorio, prefix)):
+                path = os.path.join(directorio, prefix, fname)
+                if not fname.endswith('.gz') or fname[:-3] in en_uso or os.path.getmtime(path) > limite:
+                    continue
+                os.unlink(path)
+                eliminados += 1
+        if eliminados:
+            _logger.info(f"Eliminados {eliminados} archivos fríos de diseño sin versiones")
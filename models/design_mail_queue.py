@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+class DesignMailQueue(models.Model):
+    """Correo de diseño pendiente de renderizar.
+
+    design.design._enviar_plantilla solo guarda aquí la plantilla, el diseño y
+    los valores de contexto que usan las plantillas; el cron de correos de
+    diseños renderiza y crea el mail.mail fuera de la petición del usuario."""
+    _name = 'design.mail.queue'
+    _description = 'Correo de diseño pendiente de renderizar'
+    _order = 'id'
+
+    # Claves de contexto que leen las plantillas de correo del módulo
+    _CONTEXT_KEYS = ('lang', 'user_name', 'motivo_rechazo')
+
+    template_id = fields.Many2one('mail.template', string='Plantilla', required=True, ondelete='cascade')
+    design_id = fields.Many2one('design.design', string='Diseño', required=True, ondelete='cascade', index=True)
+    user_id = fields.Many2one('res.users', string='Usuario', required=True, ondelete='cascade')
+    contexto = fields.Text('Contexto (JSON)')
+    email_values = fields.Text('Valores de correo (JSON)')
+
+    @api.model
+    def _valores(self, template, design, email_values=None):
+        contexto = {key: template.env.context[key] for key in self._CONTEXT_KEYS if key in template.env.context}
+        return {
+            'template_id': template.id,
+            'design_id': design.id,
+            'user_id': template.env.uid,
+            'contexto': json.dumps(contexto),
+            'email_values': json.dumps(email_values or {}),
+        }
+
+    def _renderizar(self):
+        """Crea los mail.mail de las entradas con el usuario y contexto originales.
+
+        Una entrada cuya plantilla falla al renderizar se descarta (queda en el log)
+        para no bloquear la cola."""
+        creados = 0
+        for item in self:
+            contexto = json.loads(item.contexto or '{}')
+            template = item.template_id.with_user(item.user_id).with_context(**contexto).sudo()
+            try:
+                with self.env.cr.savepoint():
+                    template.send_mail(item.design_id.id, force_send=False,
+                                       email_values=json.loads(item.email_values or '{}') or None)
+                creados += 1
+            except Exception:
+                _logger.exception(f"No se pudo renderizar la plantilla {item.template_id.id} para el diseño {item.design_id.id}")
+        self.unlink()
+        return creados
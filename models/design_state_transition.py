@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+class DesignStateTransition(models.Model):
+    """Hecho estructurado de cambio de estado de un diseño.
+
+    Se registra desde design.design.write (y desde el rechazo del portal por SQL)
+    con el tiempo que el diseño pasó en el estado que abandona, para que las
+    analíticas de ciclo no tengan que interpretar el texto del historial."""
+    _name = 'design.state.transition'
+    _description = 'Cambio de estado de diseño'
+    _order = 'fecha desc, id desc'
+
+    design_id = fields.Many2one('design.design', string='Diseño', required=True, ondelete='cascade', index=True)
+    estado_desde = fields.Selection(
+        selection=lambda self: self.env['design.design']._fields['state'].selection,
+        string='Estado anterior')
+    estado_hasta = fields.Selection(
+        selection=lambda self: self.env['design.design']._fields['state'].selection,
+        string='Estado nuevo', required=True)
+    fecha = fields.Datetime('Fecha', required=True, index=True, default=fields.Datetime.now)
+    horas_en_estado = fields.Float('Horas en el estado anterior', group_operator='sum')
+    usuario_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user)
+    # Dimensiones copiadas al momento del cambio
+    categoria_id = fields.Many2one('product.category', string='Categoría', index=True)
+    disenador_id = fields.Many2one('res.users', string='Diseñador', index=True)
+    contador_modificaciones = fields.Integer('Modificaciones al momento del cambio', group_operator='max')
+
+    @api.model
+    def _valores(self, design, estado_hasta, fecha=None):
+        """Valores del hecho para `design` saliendo de su estado actual hacia `estado_hasta`"""
+        fecha = fecha or fields.Datetime.now()
+        desde = design.fecha_cambio_estado or design.create_date or fecha
+        return {
+            'design_id': design.id,
+            'estado_desde': design.state,
+            'estado_hasta': estado_hasta,
+            'fecha': fecha,
+            'horas_en_estado': max((fecha - desde).total_seconds(), 0) / 3600.0,
+            'usuario_id': self.env.uid,
+            'categoria_id': design.categoria_id.id,
+            'disenador_id': design.create_uid.id,
+            'contador_modificaciones': design.contador_modificaciones,
+        }
+
+    @api.model
+    def _backfill_desde_historial(self):
+        """Carga inicial de los hechos a partir de las entradas 'Estado cambiado de X a Y'
+        del historial (solo si la tabla está vacía)"""
+        cr = self.env.cr
+        cr.execute("SELECT 1 FROM design_state_transition LIMIT 1")
+        if cr.fetchone():
+            return
+        self.env['design.revision_log']._flush_buffer()
+        self.env.flush_all()
+        estados = [key for key, _label in self.env['design.design']._fields['state'].selection]
+        cr.execute("""
+            INSERT INTO design_state_transition
+                   (design_id, estado_desde, estado_hasta, fecha, horas_en_estado, usuario_id,
+                    categoria_id, disenador_id, contador_modificaciones,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT t.design_id, t.desde, t.hasta, t.fecha,
+                   EXTRACT(EPOCH FROM t.fecha - LAG(t.fecha, 1, d.create_date)
+                       OVER (PARTITION BY t.design_id ORDER BY t.fecha, t.id)) / 3600.0,
+                   t.usuario_id, d.categoria_id, d.create_uid, d.contador_modificaciones,
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM (
+                SELECT l.id, l.design_id, l.create_date AS fecha, l.usuario_id,
+                       CASE WHEN m[1] = ANY(%(estados)s) THEN m[1] END AS desde, m[2] AS hasta
+                  FROM design_revision_log l,
+                       regexp_match(l.observaciones, 'Estado cambiado de (\\w+) a (\\w+)') m
+                 WHERE l.tipo = 'cambio_estado'
+                   AND m[2] = ANY(%(estados)s)
+              ) t
+              JOIN design_design d ON d.id = t.design_id
+        """, {'uid': self.env.uid, 'estados': estados})
+        _logger.info(f"Cargados {cr.rowcount} cambios de estado desde el historial")
+        # Inicio del estado vigente de cada diseño (el valor por defecto que recibe
+        # la columna al crearse es la fecha de actualización, no la real)
+        cr.execute("""
+            UPDATE design_design d
+               SET fecha_cambio_estado = COALESCE(
+                       (SELECT MAX(t.fecha) FROM design_state_transition t WHERE t.design_id = d.id),
+                       d.create_date)
+        """)
+        self.env['design.design'].invalidate_model(['fecha_cambio_estado'])
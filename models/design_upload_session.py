@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import uuid
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import config
+from odoo.tools.mimetypes import guess_mimetype
+
+_logger = logging.getLogger(__name__)
+
+# Límite de PDF que también valida design.design._check_attachments
+LIMITE_PDF = 18 * 1024 * 1024
+
+class DesignUploadSession(models.TransientModel):
+    """Subida por partes (reanudable) de un archivo de diseño.
+
+    Los bytes se van agregando a un archivo temporal en el data_dir; al
+    finalizar se mueve al filestore y se crea el design.image sin pasar nunca
+    el contenido en base64 por la memoria del worker."""
+    _name = 'design.upload.session'
+    _description = 'Sesión de subida de archivo de diseño'
+    # Permite reanudar subidas interrumpidas durante un día
+    _transient_max_hours = 24.0
+
+    token = fields.Char('Token', required=True, readonly=True, index=True,
+                        default=lambda self: uuid.uuid4().hex)
+    design_id = fields.Many2one('design.design', string='Diseño', required=True, ondelete='cascade')
+    filename = fields.Char('Nombre del Archivo', required=True)
+    total_size = fields.Integer('Tamaño total (bytes)', required=True)
+    received_size = fields.Integer('Bytes recibidos', readonly=True)
+    mimetype = fields.Char('Tipo MIME', readonly=True)
+    state = fields.Selection([
+        ('en_curso', 'En curso'),
+        ('completada', 'Completada'),
+    ], string='Estado', default='en_curso', readonly=True)
+    image_id = fields.Many2one('design.image', string='Adjunto creado', readonly=True, ondelete='set null')
+
+    # Tipos aceptados (prefijos de MIME), detectados a partir de los primeros bytes
+    _tipos_permitidos = ('image/', 'application/pdf')
+
+    @api.model
+    def _get_param_int(self, key, default):
+        value = self.env['ir.config_parameter'].sudo().get_param(f'ModuloDisenoOdoo.{key}', default)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+
+    @api.model
+    def _chunk_size(self):
+        return self._get_param_int('upload_chunk_size', 4 * 1024 * 1024)
+
+    @api.model
+    def _max_size(self):
+        return self._get_param_int('upload_max_size', 64 * 1024 * 1024)
+
+    @api.model
+    def _directorio(self):
+        path = os.path.join(config['data_dir'], 'design_uploads', self.env.cr.dbname)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _ruta_temporal(self):
+        self.ensure_one()
+        return os.path.join(self._directorio(), f'{self.token}.part')
+
+    def _offset(self):
+        """Bytes ya escritos: el archivo en disco manda, aunque una transacción se haya revertido"""
+        self.ensure_one()
+        path = self._ruta_temporal()
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    @api.model
+    def _iniciar(self, design, filename, total_size):
+        """Crea la sesión tras validar el tamaño declarado"""
+        design.check_access_rights('write')
+        design.check_access_rule('write')
+        if total_size <= 0:
+            raise ValidationError(_("El archivo está vacío."))
+        if total_size > self._max_size():
+            raise ValidationError(_("El archivo '%s' excede el tamaño máximo permitido.") % filename)
+        return self.create({
+            'design_id': design.id,
+            'filename': filename,
+            'total_size': total_size,
+        })
+
+    def _validar_tipo(self, head):
+        """Detecta el tipo con los primeros bytes y aplica los límites por tipo"""
+        self.ensure_one()
+        mimetype = guess_mimetype(head, default='application/octet-stream')
+        if not mimetype.startswith(self._tipos_permitidos):
+            raise ValidationError(_("El tipo de archivo '%s' no está permitido.") % mimetype)
+        if mimetype == 'application/pdf' and self.total_size > LIMITE_PDF:
+            raise ValidationError(_("El archivo PDF '%s' excede el límite de 18 MB.") % self.filename)
+        return mimetype
+
+    def _agregar_parte(self, offset, stream):
+        """Escribe una parte leída de `stream` a partir de `offset`.
+
+        Devuelve el nuevo offset. Si la parte no respeta los límites se descarta
+        y el archivo temporal queda como estaba."""
+        self.ensure_one()
+        if self.state != 'en_curso':
+            raise UserError(_("La subida ya fue completada."))
+        actual = self._offset()
+        if offset != actual:
+            raise UserError(_("Offset inválido: se esperaba %s.") % actual)
+
+        max_parte = self._chunk_size()
+        path = self._ruta_temporal()
+        escritos = 0
+        mimetype = self.mimetype
+        with open(path, 'ab') as f:
+            try:
+                while True:
+                    block = stream.read(64 * 1024)
+                    if not block:
+                        break
+                    if not mimetype:
+                        mimetype = self._validar_tipo(block)
+                    escritos += len(block)
+                    if escritos > max_parte or actual + escritos > self.total_size:
+                        raise ValidationError(_("La parte excede el tamaño permitido."))
+                    f.write(block)
+            except Exception:
+                f.truncate(actual)
+                raise
+
+        self.write({'received_size': actual + escritos, 'mimetype': mimetype})
+        return actual + escritos
+
+    def _finalizar(self):
+        """Mueve el archivo al filestore y lo adjunta al diseño como design.image"""
+        self.ensure_one()
+        if self.state == 'completada':
+            return self.image_id
+        if self._offset() != self.total_size:
+            raise UserError(_("La subida está incompleta (%s de %s bytes).") % (self._offset(), self.total_size))
+
+        blob = self.env['design.image.blob'].sudo()._obtener_o_crear_desde_archivo(
+            self._ruta_temporal(), self.mimetype)
+        image = self.env['design.image'].create({
+            'name': self.filename,
+            'blob_id': blob.id,
+            'design_id': self.design_id.id,
+        })
+        self.write({'state': 'completada', 'image_id': image.id})
+        _logger.info(f"Subida {self.token} completada: {self.total_size} bytes en el adjunto {image.id}")
+        return image
+
+    def unlink(self):
+        # Las sesiones abandonadas (vacuum de transitorios) liberan su archivo temporal
+        for session in self:
+            path = session._ruta_temporal()
+            if os.path.exists(path):
+                os.unlink(path)
+        return super().unlink()
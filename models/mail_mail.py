@@ -0,0 +1,100 @@
+from odoo import models, fields, api
+from odoo.tools import split_every
+from collections import defaultdict
+from datetime import timedelta
+import logging
+import threading
+
+from ..utils import metrics
+
+_logger = logging.getLogger(__name__)
+
+class MailMail(models.Model):
+    _inherit = 'mail.mail'
+
+    design_retry_count = fields.Integer(string="Reintentos de envío", default=0, readonly=True,
+                                        help="Reintentos realizados por el cron de correos de diseños tras un fallo SMTP")
+
+    def _get_design_mail_domain(self):
+        return [('model', '=', 'design.design')]
+
+    @api.model
+    def process_email_queue(self, ids=None):
+        """El cron estándar de la cola no toma los correos de diseños: los envía
+        (y reintenta) solo _cron_enviar_correos_disenos."""
+        if not ids:
+            filters = list(self.env.context.get('filters') or []) + [('model', '!=', 'design.design')]
+            self = self.with_context(filters=filters)
+        return super().process_email_queue(ids=ids)
+
+    def _contar_enviados(self):
+        """Correos de este lote entregados: en estado 'sent' o ya borrados por auto_delete"""
+        existentes = self.exists()
+        return len(self) - len(existentes) + len(existentes.filtered(lambda mail: mail.state == 'sent'))
+
+    @api.model
+    def _cron_enviar_correos_disenos(self, batch_size=None):
+        """Renderiza y envía por lotes los correos de diseños en cola.
+
+        Primero crea los mail.mail de las plantillas encoladas en design.mail.queue.
+        mail.mail.send() reutiliza una sola conexión SMTP por servidor dentro de cada
+        lote; tras cada lote se confirma la transacción para no reenviar correos ya
+        entregados si el cron se interrumpe. Los fallos de conexión SMTP se reprograman
+        con espera exponencial."""
+        params = self.env['ir.config_parameter'].sudo()
+        batch_size = batch_size or int(params.get_param('ModuloDisenoOdoo.mail_batch_size', 50))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        Queue = self.env['design.mail.queue'].sudo()
+        while True:
+            pendientes = Queue.search([], limit=batch_size)
+            if not pendientes:
+                break
+            _logger.info(f"Cola de correos de diseños: {pendientes._renderizar()} correos renderizados")
+            if auto_commit:
+                self.env.cr.commit()
+
+        now = fields.Datetime.to_string(fields.Datetime.now())
+        mails = self.search(self._get_design_mail_domain() + [
+            ('state', '=', 'outgoing'),
+            '|', ('scheduled_date', '=', False), ('scheduled_date', '<=', now),
+        ], order='id')
+        _logger.info(f"Cola de correos de diseños: {len(mails)} correos pendientes")
+
+        for batch_ids in split_every(batch_size, mails.ids):
+            batch = self.browse(batch_ids)
+            batch.send(auto_commit=auto_commit)
+            metrics.incrementar(self.env, 'design_mail_sent_total', batch._contar_enviados())
+            metrics.incrementar(self.env, 'design_mail_failed_total', len(batch.exists().filtered(lambda mail: mail.state == 'exception')))
+            batch._reprogramar_fallos_smtp()
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    def _reprogramar_fallos_smtp(self):
+        """Vuelve a poner en cola los correos que fallaron por el servidor SMTP."""
+        params = self.env['ir.config_parameter'].sudo()
+        max_retries = int(params.get_param('ModuloDisenoOdoo.mail_max_retries', 5))
+        retry_delay = int(params.get_param('ModuloDisenoOdoo.mail_retry_delay', 5))  # minutos
+
+        failed = self.exists().filtered(
+            lambda mail: mail.state == 'exception'
+            and mail.failure_type == 'mail_smtp'
+            and mail.design_retry_count < max_retries
+        )
+        by_retry = defaultdict(lambda: self.browse())
+        for mail in failed:
+            by_retry[mail.design_retry_count] |= mail
+
+        now = fields.Datetime.now()
+        for retry_count, mails in by_retry.items():
+            scheduled_date = now + timedelta(minutes=retry_delay * 2 ** retry_count)
+            mails.write({
+                'state': 'outgoing',
+                'failure_type': False,
+                'failure_reason': False,
+                'design_retry_count': retry_count + 1,
+                'scheduled_date': fields.Datetime.to_string(scheduled_date),
+            })
+            metrics.incrementar(self.env, 'design_mail_retried_total', len(mails))
+            _logger.warning(f"{len(mails)} correos de diseños reprogramados para {scheduled_date} (reintento {retry_count + 1})")
@@ -11,6 +11,13 @@ class ResPartner(models.Model):
         help='Si está marcado, el usuario será redirigido automáticamente a /my/designs en el portal'
     )
 
+    def write(self, vals):
+        res = super().write(vals)
+        # El nombre del cliente forma parte de la búsqueda de texto de sus diseños
+        if 'name' in vals:
+            self.env['design.design'].sudo().search([('cliente_id', 'in', self.ids)])._marcar_busqueda_texto()
+        return res
+
     def toggle_design_user(self):
         """Alterna el estado de Usuario Diseño"""
         for record in self:
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from odoo import models, tools
+from collections import namedtuple
+
+DesignRoles = namedtuple('DesignRoles', ['designer', 'validator', 'admin', 'portal_client'])
+
+
+class ResUsers(models.Model):
+    _inherit = 'res.users'
+
+    def _get_design_roles(self):
+        """Roles del usuario en el módulo de diseños.
+
+        Se calculan una sola vez por usuario y quedan en la caché ormcache del
+        registro; cambiar los grupos de un usuario (res.users.write) o los miembros
+        o grupos implicados de un grupo (res.groups.write) limpia la caché."""
+        self.ensure_one()
+        return self._get_design_roles_cached(self.id)
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'groups_id' in vals:
+            self.clear_caches()
+        return res
+
+    @tools.ormcache('uid')
+    def _get_design_roles_cached(self, uid):
+        user = self.browse(uid)
+        return DesignRoles(
+            designer=user.has_group('ModuloDisenoOdoo.group_disenador'),
+            validator=user.has_group('ModuloDisenoOdoo.group_validador'),
+            admin=user.has_group('base.group_system'),
+            portal_client=user.has_group('base.group_portal') or user.has_group('ModuloDisenoOdoo.group_cliente'),
+        )
+
+
+class ResGroups(models.Model):
+    _inherit = 'res.groups'
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Los roles de diseño en caché dependen de los miembros de los grupos
+        if 'users' in vals or 'implied_ids' in vals:
+            self.env['res.users'].clear_caches()
+        return res
@@ -1,7 +1,7 @@
 # modulo_diseno/models/revision_log.py
 
 from odoo import models, fields, api, _
-from odoo.exceptions import UserError
+from odoo.exceptions import UserError, ValidationError
 
 class RevisionLog(models.Model):
     _name = "design.revision_log"
@@ -20,7 +20,7 @@ class RevisionLog(models.Model):
         'activity_summary', 'activity_exception_decoration', 'activity_exception_icon'
     }
 
-    design_id = fields.Many2one("design.design", string="Diseño relacionado", ondelete="cascade", required=True)
+    design_id = fields.Many2one("design.design", string="Diseño relacionado", ondelete="cascade", required=True, index=True)
     usuario_id = fields.Many2one("res.users", string="Usuario", required=True)
     observaciones = fields.Text("Observaciones")
     tipo = fields.Selection([
@@ -38,7 +38,7 @@ class RevisionLog(models.Model):
     ], string="Tipo de acción", required=True, tracking=True)
     
     # Campos de solo lectura
-    create_date = fields.Datetime(string='Fecha de creación', readonly=True, tracking=True)
+    create_date = fields.Datetime(string='Fecha de creación', readonly=True, tracking=True, index=True)
     create_uid = fields.Many2one('res.users', string='Creado por', readonly=True)
     
     # Restringir eliminación de registros
@@ -53,9 +53,61 @@ class RevisionLog(models.Model):
             raise UserError(_("No se pueden modificar los registros del historial de revisiones."))
         return super(RevisionLog, self).write(vals)
     
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         # Asegurar que se registre el usuario que crea el registro
-        if 'usuario_id' not in vals and 'usuario_id' not in self._context:
-            vals['usuario_id'] = self.env.user.id
-        return super(RevisionLog, self).create(vals)
+        for vals in vals_list:
+            if 'usuario_id' not in vals and 'usuario_id' not in self._context:
+                vals['usuario_id'] = self.env.user.id
+        return super(RevisionLog, self).create(vals_list)
+
+    # Buffer de la transacción: las entradas se insertan juntas justo antes del commit
+    _buffer_key = 'design.revision_log.buffer'
+
+    @api.model
+    def _registrar(self, vals_list):
+        """Registra una o varias entradas del historial en el buffer de la transacción.
+
+        Las entradas se insertan en una sola creación múltiple antes del commit
+        (``cr.precommit``), en el mismo orden en que se registraron."""
+        if isinstance(vals_list, dict):
+            vals_list = [vals_list]
+        if not vals_list:
+            return
+        tipos = dict(self._fields['tipo'].selection)
+        precommit = self.env.cr.precommit
+        buffer = precommit.data.get(self._buffer_key)
+        if buffer is None:
+            buffer = precommit.data[self._buffer_key] = []
+            precommit.add(self._flush_buffer)
+        for vals in vals_list:
+            if vals.get('tipo') not in tipos:
+                raise ValidationError(_("Tipo de acción de historial no válido: %s", vals.get('tipo')))
+            vals = dict(vals)
+            vals.setdefault('usuario_id', self.env.user.id)
+            buffer.append((self.env.uid, self.env.su, vals))
+
+    @api.model
+    def _flush_buffer(self):
+        """Inserta las entradas pendientes del buffer (se llama en el precommit o desde tests)."""
+        buffer = self.env.cr.precommit.data.pop(self._buffer_key, None)
+        if not buffer:
+            return
+        # Los diseños eliminados en la misma transacción ya no admiten historial
+        design_ids = {vals['design_id'] for _uid, _su, vals in buffer}
+        existing = set(self.env['design.design'].browse(design_ids).exists().ids)
+
+        # Una creación por tramo consecutivo del mismo usuario, conservando el orden
+        batches = []
+        for uid, su, vals in buffer:
+            if vals['design_id'] not in existing:
+                continue
+            if batches and batches[-1][0] == (uid, su):
+                batches[-1][1].append(vals)
+            else:
+                batches.append(((uid, su), [vals]))
+        for (uid, su), vals_list in batches:
+            env = self.env(user=uid, su=su, context=dict(
+                self.env.context, tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True))
+            env['design.revision_log'].create(vals_list)
+        self.flush_model()
@@ -0,0 +1,137 @@
+# modulo_diseno/models/revision_log_archive.py
+
+from odoo import models, fields, api, _
+from collections import defaultdict
+from datetime import timedelta
+import base64
+import json
+import logging
+import threading
+import zlib
+
+_logger = logging.getLogger(__name__)
+
+class RevisionLogArchive(models.Model):
+    """Resumen mensual archivado del historial de revisiones.
+
+    Cada registro agrupa las entradas de un diseño, mes y tipo de acción. Guarda
+    la cantidad, el rango de fechas y las entradas originales en JSON comprimido."""
+    _name = "design.revision_log_archive"
+    _description = "Historial de revisiones archivado"
+    _order = "mes desc, design_id, tipo"
+
+    design_id = fields.Many2one("design.design", string="Diseño relacionado", ondelete="cascade", required=True, index=True)
+    mes = fields.Date("Mes", required=True, index=True)
+    tipo = fields.Selection(
+        selection=lambda self: self.env['design.revision_log']._fields['tipo'].selection,
+        string="Tipo de acción", required=True)
+    cantidad = fields.Integer("Cantidad de entradas", group_operator='sum')
+    fecha_desde = fields.Datetime("Primera entrada")
+    fecha_hasta = fields.Datetime("Última entrada")
+    datos = fields.Binary("Entradas comprimidas", attachment=False)
+    entradas = fields.Text("Entradas", compute='_compute_entradas')
+
+    _sql_constraints = [
+        ('design_mes_tipo_uniq', 'unique(design_id, mes, tipo)',
+         'Ya existe un resumen archivado para este diseño, mes y tipo.'),
+    ]
+
+    @api.model
+    def _comprimir(self, entries):
+        return base64.b64encode(zlib.compress(json.dumps(entries).encode(), 9))
+
+    @api.model
+    def _descomprimir(self, datos):
+        if not datos:
+            return []
+        return json.loads(zlib.decompress(base64.b64decode(datos)))
+
+    @api.depends('datos')
+    def _compute_entradas(self):
+        """Descomprime las entradas solo al abrir el registro"""
+        users = {}
+        for record in self:
+            lines = []
+            for entry in record._descomprimir(record.datos):
+                if entry['usuario_id'] not in users:
+                    users[entry['usuario_id']] = self.env['res.users'].browse(entry['usuario_id']).exists().name or '-'
+                lines.append(f"{entry['create_date']} - {users[entry['usuario_id']]}: {entry['observaciones'] or ''}")
+            record.entradas = '\n'.join(lines)
+
+    @api.model
+    def _cron_archivar_historial(self, batch_size=5000):
+        """Mueve al archivo las entradas del historial más antiguas que la antigüedad configurada.
+
+        Procesa por lotes: agrupa las entradas por (diseño, mes, tipo), las fusiona con
+        el resumen existente y las elimina de design_revision_log."""
+        dias = int(self.env['ir.config_parameter'].sudo().get_param('ModuloDisenoOdoo.revision_log_archive_days', 365))
+        limite = fields.Datetime.now() - timedelta(days=dias)
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        total = 0
+
+        while True:
+            self.env['design.revision_log'].flush_model()
+            self.env.cr.execute("""
+                SELECT id, design_id, usuario_id, tipo, observaciones, create_date
+                  FROM design_revision_log
+                 WHERE create_date < %s
+              ORDER BY id
+                 LIMIT %s
+            """, (limite, batch_size))
+            rows = self.env.cr.dictfetchall()
+            if not rows:
+                break
+
+            grupos = defaultdict(list)
+            for row in rows:
+                mes = row['create_date'].date().replace(day=1)
+                grupos[(row['design_id'], mes, row['tipo'])].append({
+                    'id': row['id'],
+                    'usuario_id': row['usuario_id'],
+                    'observaciones': row['observaciones'],
+                    'create_date': fields.Datetime.to_string(row['create_date']),
+                })
+            self._fusionar_grupos(grupos)
+
+            ids = tuple(row['id'] for row in rows)
+            self.env.cr.execute(
+                "DELETE FROM mail_message WHERE model = 'design.revision_log' AND res_id IN %s", (ids,))
+            self.env.cr.execute(
+                "DELETE FROM mail_followers WHERE res_model = 'design.revision_log' AND res_id IN %s", (ids,))
+            self.env.cr.execute("DELETE FROM design_revision_log WHERE id IN %s", (ids,))
+            self.env['design.revision_log'].invalidate_model()
+            total += len(rows)
+            if auto_commit:
+                self.env.cr.commit()
+
+        _logger.info(f"Historial de revisiones: {total} entradas archivadas (anteriores a {limite})")
+        return total
+
+    def _fusionar_grupos(self, grupos):
+        """Crea o actualiza los resúmenes de cada (diseño, mes, tipo)"""
+        existentes = {
+            (archive.design_id.id, archive.mes, archive.tipo): archive
+            for archive in self.search([
+                ('design_id', 'in', list({key[0] for key in grupos})),
+                ('mes', 'in', list({key[1] for key in grupos})),
+            ])
+        }
+        vals_list = []
+        for (design_id, mes, tipo), entries in grupos.items():
+            archive = existentes.get((design_id, mes, tipo))
+            if archive:
+                entries = archive._descomprimir(archive.datos) + entries
+            entries.sort(key=lambda entry: entry['id'])
+            vals = {
+                'cantidad': len(entries),
+                'fecha_desde': entries[0]['create_date'],
+                'fecha_hasta': entries[-1]['create_date'],
+                'datos': self._comprimir(entries),
+            }
+            if archive:
+                archive.write(vals)
+            else:
+                vals.update({'design_id': design_id, 'mes': mes, 'tipo': tipo})
+                vals_list.append(vals)
+        if vals_list:
+            self.create(vals_list)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+from . import test_performance
+from . import test_portal_performance
+from . import test_design_storage
+from . import test_transicion_masiva
+from . import test_design_mail
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Utilidades comunes de los benchmarks del módulo de diseños.
+
+Incluye un generador de datos sintéticos (clientes, categorías, plantillas, diseños,
+ítems de checklist, imágenes y mensajes) y la medición de consultas SQL contra las
+líneas base de ``perf_baselines.json``. El tiempo de cada escenario solo se registra
+en el log: depende de la máquina y no sirve como umbral de regresión.
+
+Los benchmarks no forman parte de la ejecución estándar; se lanzan con
+``--test-tags design_perf``. Para regenerar las líneas base, ejecutarlos con
+``DESIGN_PERF_RECORD=1`` en el entorno de referencia: los valores medidos se
+escriben en el archivo en lugar de compararse. Un escenario sin línea base
+registrada hace fallar el test."""
+import base64
+import io
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+from odoo.tests.common import new_test_user
+
+_logger = logging.getLogger(__name__)
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'perf_baselines.json')
+RECORD_MODE = os.environ.get('DESIGN_PERF_RECORD') == '1'
+
+
+def _imagen_png(size=64, color=(200, 60, 60)):
+    """Devuelve una imagen PNG en base64"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue())
+
+
+class DesignPerfMixin:
+    """Mezcla para TransactionCase / HttpCase con el generador y la medición"""
+
+    _medidas = {}
+
+    @classmethod
+    def _crear_usuarios(cls):
+        cls.user_staff = new_test_user(
+            cls.env, login='design_perf_staff',
+            groups='base.group_user,ModuloDisenoOdoo.group_disenador,ModuloDisenoOdoo.group_validador',
+        )
+        cls.user_portal = new_test_user(
+            cls.env, login='design_perf_portal', groups='base.group_portal',
+        )
+
+    @classmethod
+    def _generar_datos(cls, n_clientes=3, n_categorias=2, n_disenos=10, n_items=8, n_imagenes=2, n_mensajes=5):
+        """Genera el conjunto de datos sintético y lo guarda en atributos de la clase.
+
+        Los diseños del cliente portal quedan visibles y en estado 'cliente'."""
+        env = cls.env
+        cls.categorias = env['product.category'].create([
+            {'name': f'Categoría perf {i}'} for i in range(n_categorias)
+        ])
+        cls.plantillas = env['design.checklist_template'].create([{
+            'name': f'Plantilla perf {categoria.name} {etapa}',
+            'categoria_id': categoria.id,
+            'etapa': etapa,
+            'item_ids': [(0, 0, {'name': f'Ítem {etapa} {i}', 'orden': i}) for i in range(n_items)],
+        } for categoria in cls.categorias for etapa in ('etapa1', 'etapa2')])
+
+        cls.clientes = env['res.partner'].create([
+            {'name': f'Cliente perf {i}', 'email': f'cliente{i}@example.com'} for i in range(n_clientes)
+        ]) | cls.user_portal.partner_id
+
+        Design = env['design.design'].with_user(cls.user_staff)
+        cls.designs = Design.create([{
+            'name': f'Diseño perf {cliente.name} {i}',
+            'cliente_id': cliente.id,
+            'categoria_id': cls.categorias[i % n_categorias].id,
+        } for cliente in cls.clientes for i in range(n_disenos)]).sudo()
+
+        imagen = _imagen_png()
+        env['design.image'].create([{
+            'name': f'imagen_{i}.png',
+            'file_data': imagen,
+            'design_id': design.id,
+        } for design in cls.designs for i in range(n_imagenes)])
+
+        for design in cls.designs:
+            for i in range(n_mensajes):
+                design.message_post(body=f'Mensaje perf {i}', message_type='comment', subtype_xmlid='mail.mt_comment')
+
+        cls.designs_portal = cls.designs.filtered(lambda d: d.cliente_id == cls.user_portal.partner_id)
+        cls.designs_portal.write({'state': 'cliente', 'visible_para_cliente': True})
+        env['design.revision_log']._flush_buffer()
+        env.flush_all()
+
+    # ------------------------------------------------------------------
+    # Medición
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _cargar_baselines(cls):
+        if not os.path.exists(BASELINES_PATH):
+            return {'tolerancia': 0.1, 'margen': 2, 'escenarios': {}}
+        with open(BASELINES_PATH) as archivo:
+            return json.load(archivo)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if RECORD_MODE and cls._medidas:
+            baselines = cls._cargar_baselines()
+            baselines.setdefault('escenarios', {}).update(cls._medidas)
+            with open(BASELINES_PATH, 'w') as archivo:
+                json.dump(baselines, archivo, indent=4, sort_keys=True)
+                archivo.write('\n')
+            _logger.info(f"Líneas base de rendimiento actualizadas: {sorted(cls._medidas)}")
+
+    def _finalizar_medicion(self):
+        """Vuelca a la base lo pendiente para que cuente dentro de la medición"""
+        self.env['design.revision_log']._flush_buffer()
+        self.env.flush_all()
+
+    @contextmanager
+    def medir(self, escenario):
+        """Mide las consultas SQL del bloque y las compara con la línea base"""
+        self._finalizar_medicion()
+        self.env.invalidate_all()
+        consultas_inicio = self.cr.sql_log_count
+        inicio = time.perf_counter()
+        yield
+        self._finalizar_medicion()
+        segundos = time.perf_counter() - inicio
+        consultas = self.cr.sql_log_count - consultas_inicio
+        _logger.info(f"[design_perf] {escenario}: {consultas} consultas, {segundos:.3f} s")
+        self._comparar_con_baseline(escenario, consultas)
+
+    def _comparar_con_baseline(self, escenario, consultas):
+        if RECORD_MODE:
+            type(self)._medidas[escenario] = {'queries': consultas}
+            return
+        baselines = self._cargar_baselines()
+        baseline = baselines.get('escenarios', {}).get(escenario) or {}
+        # Sin línea base el escenario no protege contra regresiones: es un fallo
+        self.assertIsNotNone(
+            baseline.get('queries'),
+            f"{escenario}: sin línea base de consultas en perf_baselines.json "
+            f"(registrarla ejecutando los tests con DESIGN_PERF_RECORD=1)")
+        maximo = int(baseline['queries'] * (1 + baselines.get('tolerancia', 0.1))) + baselines.get('margen', 2)
+        self.assertLessEqual(
+            consultas, maximo,
+            f"{escenario}: {consultas} consultas superan la línea base de {baseline['queries']} (máximo {maximo})")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+
+@tagged('post_install', '-at_install')
+class TestDesignMail(TransactionCase):
+    """Cola de correos de diseños: reintentos con espera tras fallos SMTP"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('ModuloDisenoOdoo.mail_retry_delay', 5)
+        categoria = cls.env['product.category'].create({'name': 'Categoría correo'})
+        cliente = cls.env['res.partner'].create({'name': 'Cliente correo', 'email': 'cliente.correo@example.com'})
+        cls.design = cls.env['design.design'].create({
+            'name': 'Diseño correo',
+            'cliente_id': cliente.id,
+            'categoria_id': categoria.id,
+        })
+        cls.MailMail = cls.env['mail.mail'].sudo()
+
+    def setUp(self):
+        super().setUp()
+        self.smtp_caido = True
+        self.enviados = []
+        IrMailServer = self.registry['ir.mail_server']
+        test = self
+
+        def connect(self, *args, **kwargs):
+            if test.smtp_caido:
+                raise ConnectionRefusedError('SMTP no disponible')
+            return None
+
+        def send_email(self, message, *args, **kwargs):
+            test.enviados.append(message['To'])
+            return message['Message-Id']
+
+        self.startPatcher(patch.object(IrMailServer, 'connect', connect))
+        self.startPatcher(patch.object(IrMailServer, 'send_email', send_email))
+
+    def _crear_correo(self):
+        return self.MailMail.create({
+            'subject': 'Diseño pendiente',
+            'body_html': '<p>Hay un diseño pendiente</p>',
+            'email_to': 'disenador@example.com',
+            'model': 'design.design',
+            'res_id': self.design.id,
+            'auto_delete': False,
+        })
+
+    def _programado(self, mail):
+        # mail.mail.scheduled_date es un Char en Odoo 16
+        return fields.Datetime.to_datetime(mail.scheduled_date)
+
+    def _vencer_espera(self, mail):
+        mail.scheduled_date = fields.Datetime.to_string(fields.Datetime.now() - timedelta(minutes=1))
+
+    def test_reintento_con_espera_y_envio(self):
+        mail = self._crear_correo()
+
+        # Primer intento: falla la conexión y se reprograma con espera
+        antes = fields.Datetime.now()
+        self.MailMail._cron_enviar_correos_disenos()
+        self.assertEqual(mail.state, 'outgoing')
+        self.assertEqual(mail.design_retry_count, 1)
+        self.assertGreaterEqual(self._programado(mail), antes + timedelta(minutes=5))
+
+        # Mientras no vence la espera el cron no lo vuelve a intentar
+        self.smtp_caido = False
+        self.MailMail._cron_enviar_correos_disenos()
+        self.assertEqual(mail.state, 'outgoing')
+        self.assertNotIn('disenador@example.com', ' '.join(self.enviados))
+
+        # Segundo fallo: la espera se duplica
+        self.smtp_caido = True
+        self._vencer_espera(mail)
+        antes = fields.Datetime.now()
+        self.MailMail._cron_enviar_correos_disenos()
+        self.assertEqual(mail.design_retry_count, 2)
+        self.assertGreaterEqual(self._programado(mail), antes + timedelta(minutes=10))
+
+        # Vencida la espera y con el servidor disponible, se envía
+        self.smtp_caido = False
+        self._vencer_espera(mail)
+        self.MailMail._cron_enviar_correos_disenos()
+        self.assertEqual(mail.state, 'sent')
+        self.assertIn('disenador@example.com', ' '.join(self.enviados))
+
+    def test_cola_estandar_no_toma_correos_de_disenos(self):
+        mail = self._crear_correo()
+        self.smtp_caido = False
+        self.MailMail.process_email_queue()
+        self.assertEqual(mail.state, 'outgoing')
+        self.assertNotIn('disenador@example.com', ' '.join(self.enviados))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import io
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from ..utils import ingesta
+from .common import _imagen_png
+
+
+@tagged('post_install', '-at_install')
+class TestDesignStorage(TransactionCase):
+    """Subida por partes y contenido de design.image.blob"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.categoria = cls.env['product.category'].create({'name': 'Categoría almacenamiento'})
+        cliente = cls.env['res.partner'].create({'name': 'Cliente almacenamiento'})
+        cls.design = cls.env['design.design'].create({
+            'name': 'Diseño almacenamiento',
+            'cliente_id': cliente.id,
+            'categoria_id': cls.categoria.id,
+        })
+
+    def _subir_por_partes(self, contenido, filename, chunk=4096):
+        Session = self.env['design.upload.session']
+        session = Session._iniciar(self.design, filename, len(contenido))
+        offset = 0
+        while offset < len(contenido):
+            offset = session._agregar_parte(offset, io.BytesIO(contenido[offset:offset + chunk]))
+        return session._finalizar()
+
+    def _assert_contenido(self, image, contenido):
+        self.assertEqual(image.checksum, hashlib.sha1(contenido).hexdigest())
+        self.assertEqual(image.file_size, len(contenido))
+        image.blob_id.invalidate_recordset()
+        self.assertEqual(base64.b64decode(image.blob_id.file_data), contenido)
+        self.assertEqual(base64.b64decode(image.file_data), contenido)
+
+    def test_subida_por_partes_pdf(self):
+        contenido = b'%PDF-1.4\n' + bytes(range(256)) * 64
+        image = self._subir_por_partes(contenido, 'plano.pdf')
+        self.assertEqual(image.mimetype, 'application/pdf')
+        self._assert_contenido(image, contenido)
+
+    def test_subida_por_partes_imagen(self):
+        contenido = base64.b64decode(_imagen_png(size=256))
+        image = self._subir_por_partes(contenido, 'boceto.png', chunk=512)
+        self.assertEqual(image.mimetype, 'image/png')
+        self.assertTrue(image.image_128)
+        self._assert_contenido(image, contenido)
+        if ingesta.webp_disponible():
+            self.assertTrue(image.blob_id.webp)
+            webp = base64.b64decode(image.blob_id.image_512_webp)
+            self.assertEqual((webp[:4], webp[8:12]), (b'RIFF', b'WEBP'))
+
+    def test_archivar_y_restaurar_version(self):
+        contenido = base64.b64decode(_imagen_png(size=128, color=(10, 120, 200)))
+        image = self.env['design.image'].create({
+            'name': 'version_1.png',
+            'file_data': base64.b64encode(contenido),
+            'design_id': self.design.id,
+        })
+        version = self.env['design.image.version']._archivar_imagenes(image, 'correcciones')
+        self.assertEqual(version.checksum, hashlib.sha1(contenido).hexdigest())
+        # El original desaparece (y su blob con él) como en action_solicitar_correcciones
+        image.unlink()
+        self.assertFalse(self.env['design.image.blob'].search([('checksum', '=', version.checksum)]))
+
+        version.action_restaurar()
+        restaurada = version.restored_image_id
+        self.assertEqual(restaurada.design_id, self.design)
+        self.assertEqual(restaurada.name, 'version_1.png')
+        self._assert_contenido(restaurada, contenido)
+
+    def test_restaurar_version_una_sola_vez(self):
+        contenido = base64.b64decode(_imagen_png(size=96, color=(40, 160, 40)))
+        image = self.env['design.image'].create({
+            'name': 'version_unica.png',
+            'file_data': base64.b64encode(contenido),
+            'design_id': self.design.id,
+        })
+        version = self.env['design.image.version']._archivar_imagenes(image, 'rechazo')
+        image.unlink()
+
+        version.action_restaurar()
+        Image = self.env['design.image']
+        restauradas = Image.search_count([('design_id', '=', self.design.id)])
+        with self.assertRaises(UserError):
+            version.action_restaurar()
+        self.assertEqual(Image.search_count([('design_id', '=', self.design.id)]), restauradas)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+from .common import DesignPerfMixin
+
+
+@tagged('post_install', '-at_install', '-standard', 'design_perf')
+class TestDesignPerformance(DesignPerfMixin, TransactionCase):
+    """Consultas SQL y tiempo de los métodos críticos de design.design y checklist"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._crear_usuarios()
+        cls._generar_datos()
+
+    def test_design_create_batch(self):
+        Design = self.env['design.design'].with_user(self.user_staff)
+        vals_list = [{
+            'name': f'Diseño nuevo {i}',
+            'cliente_id': self.clientes[i % len(self.clientes)].id,
+            'categoria_id': self.categorias[i % len(self.categorias)].id,
+        } for i in range(50)]
+        with self.medir('design_create_50'):
+            designs = Design.create(vals_list)
+        self.assertEqual(len(designs), 50)
+        self.assertTrue(all(design.checklist_total_etapa1 for design in designs))
+
+    def test_checklist_item_write(self):
+        design = self.designs[0]
+        items = design.checklist_ids.with_user(self.user_staff)
+        with self.medir('checklist_item_write_designer'):
+            items.write({'validado_por_disenador': True})
+        self.assertTrue(design.etapa1_completa)
+        self.assertEqual(design.state, 'validacion')
+
+    def test_checklist_item_toggle_one_by_one(self):
+        design = self.designs[1]
+        items = design.checklist_ids.with_user(self.user_staff)
+        with self.medir('checklist_item_write_per_row'):
+            for item in items:
+                item.write({'validado_por_disenador': True})
+        self.assertTrue(design.etapa1_completa)
+
+    def test_marcar_como_rechazado(self):
+        design = self.designs[2]
+        design.write({'state': 'validacion'})
+        with self.medir('marcar_como_rechazado'):
+            design.with_user(self.user_staff).marcar_como_rechazado('Motivo de prueba')
+        self.assertEqual(design.state, 'rechazado')
+
+    def test_rechazar_en_lote(self):
+        designs = self.designs[3:8]
+        designs.write({'state': 'validacion'})
+        with self.medir('rechazar_en_lote_5'):
+            designs.with_user(self.user_staff).rechazar_en_lote('Motivo de prueba')
+        self.assertEqual(set(designs.mapped('state')), {'rechazado'})
+
+    def test_action_solicitar_correcciones(self):
+        design = self.designs_portal[0]
+        with self.medir('action_solicitar_correcciones'):
+            design.action_solicitar_correcciones('Cambiar los colores')
+        self.assertEqual(design.state, 'correcciones_solicitadas')
+        self.assertFalse(design.attachment_ids)
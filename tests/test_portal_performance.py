@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tests.common import HttpCase
+
+from .common import DesignPerfMixin
+
+
+@tagged('post_install', '-at_install', '-standard', 'design_perf')
+class TestDesignPortalPerformance(DesignPerfMixin, HttpCase):
+    """Consultas SQL y tiempo de las páginas del portal de diseños"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._crear_usuarios()
+        cls._generar_datos(n_disenos=30)
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate('design_perf_portal', 'design_perf_portal')
+
+    def _get(self, url):
+        response = self.url_open(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_portal_my_designs(self):
+        # Primera petición fuera de la medición: calienta cachés de vistas y rutas
+        self._get('/my/designs')
+        with self.medir('portal_my_designs'):
+            self._get('/my/designs')
+
+    def test_portal_my_designs_search(self):
+        self._get('/my/designs')
+        with self.medir('portal_my_designs_search'):
+            self._get('/my/designs?search=perf&search_in=name&sortby=name')
+
+    def test_portal_my_design(self):
+        design = self.designs_portal[0]
+        url = f'/my/design/{design.id}?access_token={design._portal_ensure_token()}'
+        self._get(url)
+        with self.medir('portal_my_design'):
+            response = self._get(url)
+        self.assertTrue(response.headers.get('ETag'))
+
+    def test_portal_my_design_not_modified(self):
+        design = self.designs_portal[1]
+        url = f'/my/design/{design.id}?access_token={design._portal_ensure_token()}'
+        etag = self._get(url).headers['ETag']
+        with self.medir('portal_my_design_304'):
+            response = self.url_open(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase, new_test_user
+
+
+@tagged('post_install', '-at_install')
+class TestTransicionMasiva(TransactionCase):
+    """Confirmación y rechazo en lote de diseños"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.validador = new_test_user(
+            cls.env, login='design_lote_validador',
+            groups='base.group_user,ModuloDisenoOdoo.group_disenador,ModuloDisenoOdoo.group_validador',
+        )
+        categoria = cls.env['product.category'].create({'name': 'Categoría lote'})
+        cliente = cls.env['res.partner'].create({'name': 'Cliente lote', 'email': 'cliente.lote@example.com'})
+        cls.designs = cls.env['design.design'].with_user(cls.validador).create([{
+            'name': f'Diseño lote {i}',
+            'cliente_id': cliente.id,
+            'categoria_id': categoria.id,
+        } for i in range(3)]).sudo()
+        cls.designs.write({'state': 'validacion'})
+
+    def test_rechazar_en_lote(self):
+        Queue = self.env['design.mail.queue'].sudo()
+        encolados = Queue.search_count([])
+        self.designs.with_user(self.validador).rechazar_en_lote('Colores fuera de marca')
+
+        self.assertEqual(set(self.designs.mapped('state')), {'rechazado'})
+        self.assertEqual(set(self.designs.mapped('observaciones_rechazo')), {'Colores fuera de marca'})
+        for design in self.designs:
+            nota = design.message_ids.filtered(lambda message: 'Colores fuera de marca' in (message.body or ''))
+            self.assertEqual(len(nota), 1)
+            self.assertIn('Se requiere nueva versión', nota.body)
+        if self.env.ref('ModuloDisenoOdoo.email_template_diseno_rechazado', raise_if_not_found=False):
+            self.assertEqual(Queue.search_count([]) - encolados, len(self.designs))
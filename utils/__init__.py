@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+from . import profiling
+from . import metrics
+from . import ingesta
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Pool de procesos acotado para el trabajo de CPU de la ingesta de adjuntos.
+
+Las miniaturas de design.image.blob se generan con ``odoo.tools.image.image_process``
+en un ProcessPoolExecutor compartido por el proceso, de modo que una subida con
+varios archivos no se serializa en la CPU de un único worker.
+
+Los procesos se crean con ``spawn`` (no es seguro hacer fork de un servidor con
+hilos) y solo ejecutan funciones de ``odoo.tools``, importables sin la ruta de
+addons. Por eso cada tarea es una sola llamada a image_process: para no enviar el
+archivo original una vez por variante, solo la primera variante (la mayor) se
+calcula desde el original y las demás se derivan de ella.
+
+El tamaño del pool se configura con ``ModuloDisenoOdoo.ingest_workers`` y es por
+proceso de Odoo: en modo prefork cada worker HTTP crea su propio pool, así que el
+máximo real de procesos de ingesta es ``workers × ingest_workers``, y esos procesos
+no están sujetos a ``limit_memory_soft`` / ``limit_memory_hard``. Con 0, si el pool
+falla o si una tarea supera ``ModuloDisenoOdoo.ingest_timeout`` segundos, el
+trabajo se hace en el propio proceso. El pool se cierra al terminar el worker."""
+import atexit
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, features
+
+from odoo import _
+from odoo.exceptions import UserError
+from odoo.tools.image import image_process
+
+_logger = logging.getLogger(__name__)
+
+# Procesos por worker de Odoo (no en total): ver la nota del módulo
+WORKERS_PARAM = 'ModuloDisenoOdoo.ingest_workers'
+TIMEOUT_PARAM = 'ModuloDisenoOdoo.ingest_timeout'
+
+_lock = threading.Lock()
+_executor = None
+_executor_workers = 0
+
+
+def _workers(env):
+    try:
+        return max(int(env['ir.config_parameter'].sudo().get_param(WORKERS_PARAM, 2)), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _timeout(env):
+    try:
+        return max(float(env['ir.config_parameter'].sudo().get_param(TIMEOUT_PARAM, 60)), 1.0)
+    except (TypeError, ValueError):
+        return 60.0
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    with _lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_workers = workers
+        return _executor
+
+
+def _descartar_executor(terminar=False):
+    """Cierra el pool; con `terminar` también mata los procesos que sigan ocupados"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            procesos = list((getattr(_executor, '_processes', None) or {}).values())
+            _executor.shutdown(wait=False)
+            if terminar:
+                for proceso in procesos:
+                    proceso.terminate()
+        _executor = None
+
+
+atexit.register(_descartar_executor, terminar=True)
+
+
+def _procesar(source, kwargs):
+    try:
+        return image_process(source, **kwargs)
+    except UserError:
+        raise
+    except Exception as e:
+        raise UserError(_("No se pudo generar la miniatura de la imagen: %s", e)) from e
+
+
+def _ejecutar(env, tareas):
+    """Ejecuta image_process para cada (bytes, kwargs) de `tareas` y devuelve los resultados en orden.
+
+    Los errores de una imagen (resolución excesiva, formato ilegible) se
+    informan como UserError, igual que si se procesara en el propio worker."""
+    workers = _workers(env)
+    if workers and len(tareas) > 1:
+        limite = time.monotonic() + _timeout(env)
+        try:
+            executor = _get_executor(workers)
+            futures = [executor.submit(image_process, source, **kwargs) for source, kwargs in tareas]
+            return [future.result(timeout=max(limite - time.monotonic(), 0)) for future in futures]
+        except BrokenProcessPool:
+            _logger.warning("El pool de ingesta dejó de responder; se procesa en el worker actual")
+            _descartar_executor()
+        except TimeoutError:
+            _logger.warning("El pool de ingesta superó el tiempo límite; se procesa en el worker actual")
+            _descartar_executor(terminar=True)
+        except UserError:
+            raise
+        except Exception as e:
+            raise UserError(_("No se pudo generar la miniatura de la imagen: %s", e)) from e
+    return [_procesar(source, kwargs) for source, kwargs in tareas]
+
+
+def procesar_imagenes(env, tareas):
+    """Genera las variantes de cada (bytes, [kwargs, ...]) de `tareas`.
+
+    La primera variante de cada imagen (debe ser la mayor) se calcula desde los
+    bytes originales y las siguientes a partir de ella. Devuelve, por imagen, la
+    lista de variantes en el mismo orden."""
+    primeras = _ejecutar(env, [(source, variantes[0]) for source, variantes in tareas])
+    derivadas = iter(_ejecutar(env, [
+        (base, kwargs)
+        for base, (_source, variantes) in zip(primeras, tareas)
+        for kwargs in variantes[1:]
+    ]))
+    return [
+        [base] + [next(derivadas) for _kwargs in variantes[1:]]
+        for base, (_source, variantes) in zip(primeras, tareas)
+    ]
+
+
+def webp_disponible():
+    """Indica si Pillow fue compilado con soporte de WebP"""
+    return features.check('webp')
+
+
+def a_webp(imagen, quality=80):
+    """Recodifica una miniatura ya generada (bytes) como WebP, conservando la transparencia.
+
+    image_process no admite WebP como formato de salida en Odoo 16, por eso se
+    hace con Pillow a partir de la miniatura, que ya es pequeña. Corre en el
+    proceso que llama y no en el pool: los procesos del pool solo pueden
+    ejecutar funciones importables sin la ruta de addons, y esta es del módulo.
+    El costo queda acotado a recodificar las miniaturas de 512 y 1024 px."""
+    image = Image.open(io.BytesIO(imagen))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+    salida = io.BytesIO()
+    image.save(salida, 'WEBP', quality=quality, method=4)
+    return salida.getvalue()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Métricas del flujo de diseños en formato Prometheus.
+
+Cada worker acumula contadores e histogramas en memoria y, como máximo cada
+``FLUSH_INTERVAL`` segundos, escribe una instantánea JSON en
+``<data_dir>/design_metrics/<base de datos>/<pid>.json``. El endpoint
+``/design/metrics`` suma las instantáneas de todos los workers, por lo que no se
+necesita memoria compartida ni consultas a design.revision_log. Las instantáneas
+de workers que ya terminaron (pid inexistente y sin escrituras durante
+``STALE_AFTER`` segundos) se eliminan al agregar; Prometheus ve la baja de esos
+contadores como un reinicio."""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 15
+STALE_AFTER = 3600
+
+# Límites superiores (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPCIONES = {
+    'design_state_transitions_total': ('counter', 'Transiciones de estado de diseños por estado origen y destino'),
+    'design_portal_request_seconds': ('histogram', 'Latencia de las rutas del portal de diseños'),
+    'design_mail_enqueued_total': ('counter', 'Correos de diseños encolados'),
+    'design_mail_sent_total': ('counter', 'Correos de diseños enviados por el cron'),
+    'design_mail_failed_total': ('counter', 'Correos de diseños con error de envío'),
+    'design_mail_retried_total': ('counter', 'Correos de diseños reprogramados tras un fallo SMTP'),
+    'design_attachment_bytes_served_total': ('counter', 'Bytes de adjuntos de diseños servidos por el portal'),
+    'design_checklist_toggles_total': ('counter', 'Ítems de checklist validados por rol'),
+}
+
+_lock = threading.Lock()
+_counters = {}      # {dbname: {(nombre, etiquetas): valor}}
+_histograms = {}    # {dbname: {(nombre, etiquetas): [conteos por bucket..., suma, total]}}
+_last_flush = {}
+
+
+def _etiquetas(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _directorio(dbname):
+    return os.path.join(config['data_dir'], 'design_metrics', dbname)
+
+
+def incrementar(env, nombre, valor=1, **labels):
+    """Incrementa un contador"""
+    _incrementar(env.cr.dbname, nombre, valor, labels)
+
+
+def incrementar_al_confirmar(env, nombre, valor=1, **labels):
+    """Incrementa un contador cuando la transacción en curso se confirma.
+
+    Para contadores que describen datos guardados: si la transacción se revierte
+    no se cuentan."""
+    env.cr.postcommit.add(functools.partial(_incrementar, env.cr.dbname, nombre, valor, labels))
+
+
+def _incrementar(dbname, nombre, valor, labels):
+    key = (nombre, _etiquetas(labels))
+    with _lock:
+        counters = _counters.setdefault(dbname, {})
+        counters[key] = counters.get(key, 0) + valor
+    _flush_periodico(dbname)
+
+
+def observar(env, nombre, valor, **labels):
+    """Registra una observación en un histograma de latencia"""
+    dbname = env.cr.dbname
+    key = (nombre, _etiquetas(labels))
+    with _lock:
+        histograms = _histograms.setdefault(dbname, {})
+        data = histograms.get(key)
+        if data is None:
+            data = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0, 0]
+        for index, limite in enumerate(LATENCY_BUCKETS):
+            if valor <= limite:
+                data[index] += 1
+                break
+        else:
+            data[len(LATENCY_BUCKETS)] += 1
+        data[-2] += valor
+        data[-1] += 1
+    _flush_periodico(dbname)
+
+
+def cronometrar(nombre, **labels):
+    """Decorador que observa la duración de cada llamada en el histograma ``nombre``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            from odoo.http import request
+            inicio = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                if request and request.db:
+                    observar(request.env, nombre, time.perf_counter() - inicio, **labels)
+        return wrapper
+    return decorator
+
+
+def _flush_periodico(dbname):
+    if time.monotonic() - _last_flush.get(dbname, 0) >= FLUSH_INTERVAL:
+        flush(dbname)
+
+
+def flush(dbname):
+    """Escribe la instantánea de este worker (escritura atómica)"""
+    with _lock:
+        _last_flush[dbname] = time.monotonic()
+        snapshot = {
+            'counters': [[nombre, list(etiquetas), valor]
+                         for (nombre, etiquetas), valor in _counters.get(dbname, {}).items()],
+            'histograms': [[nombre, list(etiquetas), list(data)]
+                           for (nombre, etiquetas), data in _histograms.get(dbname, {}).items()],
+        }
+    directorio = _directorio(dbname)
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        path = os.path.join(directorio, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as archivo:
+            json.dump(snapshot, archivo)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        _logger.warning(f"No se pudo escribir la instantánea de métricas: {e}")
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _es_obsoleta(path, filename):
+    """Instantánea de un worker terminado: su pid no existe y no se escribe hace tiempo"""
+    pid = filename[:-len('.json')]
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        if time.time() - os.path.getmtime(path) < STALE_AFTER:
+            return False
+    except OSError:
+        return False
+    return not _proceso_vivo(int(pid))
+
+
+def _fusionar(dbname):
+    """Suma las instantáneas de todos los workers"""
+    counters, histograms = {}, {}
+    directorio = _directorio(dbname)
+    if not os.path.isdir(directorio):
+        return counters, histograms
+    for filename in os.listdir(directorio):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directorio, filename)
+        if _es_obsoleta(path, filename):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as archivo:
+                snapshot = json.load(archivo)
+        except (OSError, ValueError):
+            continue
+        for nombre, etiquetas, valor in snapshot.get('counters', []):
+            key = (nombre, tuple(map(tuple, etiquetas)))
+            counters[key] = counters.get(key, 0) + valor
+        for nombre, etiquetas, data in snapshot.get('histograms', []):
+            key = (nombre, tuple(map(tuple, etiquetas)))
+            acumulado = histograms.setdefault(key, [0] * len(data))
+            for index, valor in enumerate(data):
+                acumulado[index] += valor
+    return counters, histograms
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ''
+    valores = ','.join('%s="%s"' % (key, value.replace('\\', '\\\\').replace('"', '\\"')) for key, value in pares)
+    return '{%s}' % valores
+
+
+def exportar(dbname):
+    """Devuelve las métricas agregadas de todos los workers en formato de texto Prometheus"""
+    flush(dbname)
+    counters, histograms = _fusionar(dbname)
+    lineas = []
+    nombres_contadores = {key[0] for key in counters}
+    for nombre in sorted(nombres_contadores | {key[0] for key in histograms}):
+        tipo_defecto = 'counter' if nombre in nombres_contadores else 'histogram'
+        tipo, descripcion = DESCRIPCIONES.get(nombre, (tipo_defecto, nombre))
+        lineas.append(f'# HELP {nombre} {descripcion}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for (key_nombre, etiquetas), valor in sorted(counters.items()):
+            if key_nombre == nombre:
+                lineas.append(f'{nombre}{_formatear_etiquetas(etiquetas)} {valor}')
+        for (key_nombre, etiquetas), data in sorted(histograms.items()):
+            if key_nombre != nombre:
+                continue
+            acumulado = 0
+            for limite, conteo in zip(LATENCY_BUCKETS + ('+Inf',), data[:-2]):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_formatear_etiquetas(etiquetas, [("le", str(limite))])} {acumulado}')
+            lineas.append(f'{nombre}_sum{_formatear_etiquetas(etiquetas)} {data[-2]}')
+            lineas.append(f'{nombre}_count{_formatear_etiquetas(etiquetas)} {data[-1]}')
+    return '\n'.join(lineas) + '\n'
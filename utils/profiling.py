@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Perfilado opcional de rutas del portal y métodos de design.design.
+
+El decorador ``perfilar`` mide, para una muestra de las llamadas, la cantidad de
+consultas SQL, el tiempo en SQL, el tiempo en Python y las filas leídas por
+PostgreSQL. El resultado se escribe como una línea de log JSON y, dentro de una
+petición HTTP, como cabecera ``Server-Timing``.
+
+Las filas salen de ``pg_stat_xact_user_tables``, que se lee antes de abrir y
+después de cerrar la ventana medida; las lecturas de mediciones anidadas se
+descuentan de las consultas y del tiempo SQL de la exterior.
+
+La proporción de llamadas medidas se configura con el parámetro
+``ModuloDisenoOdoo.profiling_sample_rate`` (0 desactiva, 1 mide todas). La
+profundidad se lleva en todas las llamadas: las anidadas se miden solo si la
+llamada exterior fue elegida en la muestra y nunca sortean una muestra propia."""
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+SAMPLE_RATE_PARAM = 'ModuloDisenoOdoo.profiling_sample_rate'
+
+_local = threading.local()
+
+
+def _get_env(obj):
+    env = getattr(obj, 'env', None)
+    if env is None and request:
+        env = request.env
+    return env
+
+
+def _sample_rate(env):
+    try:
+        return float(env['ir.config_parameter'].sudo().get_param(SAMPLE_RATE_PARAM, 0) or 0)
+    except ValueError:
+        return 0.0
+
+
+def _filas_leidas(cr):
+    """Filas leídas por la transacción actual según pg_stat_xact_user_tables.
+
+    Acumula las consultas y el tiempo SQL propios del perfilador para que las
+    mediciones que contienen a esta lectura puedan descontarlos."""
+    thread = threading.current_thread()
+    sql_inicio = getattr(thread, 'query_time', 0)
+    cr.execute("""
+        SELECT COALESCE(SUM(seq_tup_read + COALESCE(idx_tup_fetch, 0)), 0)
+          FROM pg_stat_xact_user_tables
+    """)
+    filas = cr.fetchone()[0]
+    _local.consultas_propias = getattr(_local, 'consultas_propias', 0) + 1
+    _local.sql_propio = getattr(_local, 'sql_propio', 0) + getattr(thread, 'query_time', 0) - sql_inicio
+    return filas
+
+
+def _server_timing(datos):
+    """Agrega la medición a la cabecera Server-Timing de la respuesta en curso"""
+    if not request:
+        return
+    token = re.sub(r'[^A-Za-z0-9_-]', '-', datos['nombre'])
+    try:
+        headers = request.future_response.headers
+    except AttributeError:
+        return
+    headers.add('Server-Timing', f'{token};dur={datos["total_ms"]};desc="{datos["consultas"]} consultas"')
+    headers.add('Server-Timing', f'{token}-sql;dur={datos["sql_ms"]}')
+
+
+def _medir(func, etiqueta, profundidad, obj, *args, **kwargs):
+    """Ejecuta la llamada elegida en la muestra y registra sus consultas y tiempos"""
+    env = _get_env(obj)
+    cr = env.cr
+    thread = threading.current_thread()
+    if not hasattr(thread, 'query_time'):
+        thread.query_count = 0
+        thread.query_time = 0
+
+    # Lectura inicial de filas fuera de la ventana medida
+    filas_inicio = _filas_leidas(cr)
+    propias_inicio = _local.consultas_propias
+    sql_propio_inicio = _local.sql_propio
+
+    consultas_inicio = cr.sql_log_count
+    sql_inicio = thread.query_time
+    inicio = time.perf_counter()
+    result = func(obj, *args, **kwargs)
+    # Las respuestas QWeb se renderizan al salir del controlador: forzarlo aquí
+    if getattr(result, 'is_qweb', False):
+        result.flatten()
+    # Se descuentan las lecturas de las mediciones anidadas
+    sql_propio = _local.sql_propio - sql_propio_inicio
+    total = time.perf_counter() - inicio - sql_propio
+    sql = thread.query_time - sql_inicio - sql_propio
+    consultas = cr.sql_log_count - consultas_inicio - (_local.consultas_propias - propias_inicio)
+
+    # Lectura final, ya cerrada la ventana
+    filas = _filas_leidas(cr) - filas_inicio
+
+    datos = {
+        'nombre': etiqueta,
+        'consultas': max(consultas, 0),
+        'sql_ms': round(sql * 1000, 2),
+        'python_ms': round((total - sql) * 1000, 2),
+        'total_ms': round(total * 1000, 2),
+        'filas': max(filas, 0),
+        'uid': env.uid,
+        'profundidad': profundidad,
+    }
+    _logger.info("design_profile %s", json.dumps(datos))
+    _server_timing(datos)
+    return result
+
+
+def perfilar(nombre=None):
+    """Decorador de perfilado para métodos de controladores y modelos"""
+    def decorator(func):
+        etiqueta = nombre or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profundidad = getattr(_local, 'profundidad', 0)
+            if profundidad:
+                muestreado = getattr(_local, 'muestreado', False)
+            else:
+                env = _get_env(self)
+                tasa = _sample_rate(env) if env is not None else 0
+                muestreado = bool(tasa) and random.random() < tasa
+                _local.muestreado = muestreado
+
+            _local.profundidad = profundidad + 1
+            try:
+                if not muestreado:
+                    return func(self, *args, **kwargs)
+                return _medir(func, etiqueta, profundidad, self, *args, **kwargs)
+            finally:
+                _local.profundidad = profundidad
+                if not profundidad:
+                    _local.muestreado = False
+        return wrapper
+    return decorator
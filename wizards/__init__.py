@@ -4,3 +4,4 @@ from . import rechazo_wizard
 from . import subir_diseno_wizard
 from . import delete_confirm_wizard
 from . import portal_access_wizard
+from . import transicion_masiva_wizard
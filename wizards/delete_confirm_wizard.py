@@ -23,7 +23,7 @@ class DesignDeleteConfirm(models.TransientModel):
             raise UserError(_("No hay diseños para eliminar."))
             
         # Verificar permisos
-        if not self.env.user.has_group('base.group_system'):
+        if not self.env.user._get_design_roles().admin:
             raise AccessError(_("Solo los administradores pueden eliminar diseños."))
             
         # Eliminar los diseños
@@ -38,7 +38,7 @@ class DesignRechazoWizard(models.TransientModel):
         self.ensure_one()
         
         # Verificar permisos
-        if not self.env.user.has_group('ModuloDisenoOdoo.group_validador'):
+        if not self.env.user._get_design_roles().validator:
             raise AccessError(_("Solo los validadores pueden rechazar diseños."))
         
         # Verificar que el diseño existe y está en estado válido
@@ -32,7 +32,7 @@ class SubirDisenoWizard(models.TransientModel):
         })
         
         # Registrar en el historial
-        self.env['design.revision_log'].create({
+        self.env['design.revision_log']._registrar({
             'design_id': self.design_id.id,
             'tipo': 'validacion_disenador',  
             'observaciones': 'Nueva versión del diseño subida después de rechazo.',
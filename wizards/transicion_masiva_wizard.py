@@ -0,0 +1,54 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+class DesignTransicionMasivaWizard(models.TransientModel):
+    _name = 'design.transicion.masiva.wizard'
+    _description = 'Transición masiva de diseños'
+
+    design_ids = fields.Many2many('design.design', string='Diseños')
+    count = fields.Integer('Número de diseños', compute='_compute_count')
+    transicion = fields.Selection([
+        ('confirmar', 'Confirmar diseños'),
+        ('rechazar', 'Rechazar diseños'),
+    ], string='Transición', required=True, default='confirmar')
+    motivo = fields.Text('Motivo del rechazo',
+                         help='Se registra en el historial y se envía al diseñador de cada diseño')
+
+    @api.model
+    def default_get(self, fields):
+        res = super().default_get(fields)
+        design_ids = self._context.get('default_design_ids') or (
+            self._context.get('active_model') == 'design.design' and self._context.get('active_ids'))
+        if design_ids:
+            res['design_ids'] = [(6, 0, design_ids)]
+        return res
+
+    @api.depends('design_ids')
+    def _compute_count(self):
+        for wizard in self:
+            wizard.count = len(wizard.design_ids)
+
+    def action_aplicar(self):
+        """Aplica la transición elegida a todos los diseños seleccionados"""
+        self.ensure_one()
+        if not self.design_ids:
+            raise UserError(_("No hay diseños seleccionados."))
+
+        if self.transicion == 'rechazar':
+            if not self.motivo or not self.motivo.strip():
+                raise UserError(_("Debe proporcionar un motivo para el rechazo."))
+            self.design_ids.rechazar_en_lote(self.motivo)
+            message = _("Se han rechazado %s diseños.", len(self.design_ids))
+        else:
+            self.design_ids.confirmar_en_lote()
+            message = _("Se han confirmado %s diseños.", len(self.design_ids))
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': message,
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }